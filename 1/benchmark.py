@@ -0,0 +1,182 @@
+import argparse
+import json
+import sys
+import tracemalloc
+
+from simulate import percentile, play_game, simulate
+
+# Board presets as (height, width, mines, games played by default)
+BOARDS = {
+    "beginner": (9, 9, 10, 200),
+    "intermediate": (16, 16, 40, 100),
+    "expert": (16, 30, 99, 50),
+    "huge": (100, 100, 2000, 5),
+    "giant": (300, 300, 18000, 1)
+}
+
+# Largest allowed change of each metric relative to the baseline, where
+# higher is worse, unless given on the command line
+THRESHOLDS = {
+    "add_knowledge_mean_us": 0.10,
+    "add_knowledge_p99_us": 0.25,
+    "knowledge_mean": 0.10,
+    "knowledge_max": 0.10,
+    "peak_memory_kb": 0.10,
+    "loss_rate": 0.05
+}
+
+
+def measure(name, games=None, seed=0, **options):
+    """
+    Plays `games` games on the board preset `name`, with MinesweeperAI
+    `options` as accepted by simulate, and returns a dictionary of metrics.
+    """
+    height, width, mines, default_games = BOARDS[name]
+    games = games or default_games
+
+    # Run in a single process so that timings are not disturbed
+    results, elapsed = simulate(
+        games, height=height, width=width, mines=mines,
+        processes=1, seed=seed, **options
+    )
+    learning = sorted(
+        latency for result in results for latency in result["learning"]
+    )
+    knowledge = [size for result in results for size in result["knowledge"]]
+
+    # Trace allocations separately, as tracing slows everything down
+    tracemalloc.start()
+    play_game(seed, height=height, width=width, mines=mines, **options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wins = sum(result["won"] for result in results)
+    return {
+        "board": [height, width, mines],
+        "games": games,
+        "games_per_sec": games / elapsed if elapsed else 0.0,
+        "loss_rate": 1 - wins / games,
+        "add_knowledge_calls": len(learning),
+        "add_knowledge_mean_us": (
+            sum(learning) / len(learning) * 1e6 if learning else 0.0
+        ),
+        "add_knowledge_p50_us": percentile(learning, 50) * 1e6,
+        "add_knowledge_p99_us": percentile(learning, 99) * 1e6,
+        "knowledge_mean": (
+            sum(knowledge) / len(knowledge) if knowledge else 0.0
+        ),
+        "knowledge_max": max(knowledge, default=0),
+        "peak_memory_kb": peak / 1024
+    }
+
+
+def compare(results, baseline, thresholds):
+    """
+    Compares benchmark `results` against `baseline` results, and returns
+    a list of messages describing each metric that got worse by more
+    than its threshold.
+
+    Rates are compared by their difference, and every other metric
+    by its change relative to the baseline.
+    """
+    regressions = []
+    for name, metrics in results["boards"].items():
+        base = baseline["boards"].get(name)
+        if base is None or base["board"] != metrics["board"]:
+            continue
+        for metric, threshold in thresholds.items():
+            if metric not in base:
+                continue
+            old, new = base[metric], metrics[metric]
+            if metric.endswith("_rate"):
+                change = new - old
+            elif old:
+                change = (new - old) / old
+            else:
+                continue
+            if change > threshold:
+                regressions.append(
+                    f"{name}: {metric} went from {old:.4g} to {new:.4g} "
+                    f"({change:+.1%}, threshold {threshold:.0%})"
+                )
+    return regressions
+
+
+def threshold(value):
+    """
+    Parses a METRIC=FRACTION command-line threshold.
+    """
+    metric, _, fraction = value.partition("=")
+    if metric not in THRESHOLDS:
+        raise argparse.ArgumentTypeError(f"unknown metric: {metric}")
+    try:
+        return metric, float(fraction)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid threshold: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark MinesweeperAI and check for regressions."
+    )
+    parser.add_argument("boards", nargs="*", metavar="board",
+                        help=f"one of {', '.join(BOARDS)} (default: all)")
+    parser.add_argument("-n", "--games", type=int,
+                        help="games per board (default: depends on board)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--guess", choices=["random", "probability"],
+                        default="random")
+    parser.add_argument("--exact", action="store_true")
+    parser.add_argument("--inference", choices=["subset", "linear"],
+                        default="subset")
+    parser.add_argument("--flood", action="store_true")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="save results as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compare against results saved with --output")
+    parser.add_argument("--threshold", type=threshold, action="append",
+                        default=[], metavar="METRIC=FRACTION",
+                        help="override a regression threshold")
+    args = parser.parse_args()
+
+    for name in args.boards:
+        if name not in BOARDS:
+            parser.error(f"unknown board: {name}")
+
+    options = {
+        "guess": args.guess, "exact": args.exact, "flood": args.flood,
+        "inference": args.inference
+    }
+    results = {"options": options, "seed": args.seed, "boards": {}}
+    for name in args.boards or BOARDS:
+        metrics = measure(name, games=args.games, seed=args.seed, **options)
+        results["boards"][name] = metrics
+        print(f"{name}: {metrics['games']} games, "
+              f"win rate {1 - metrics['loss_rate']:.1%}, "
+              f"add_knowledge mean {metrics['add_knowledge_mean_us']:.0f}us "
+              f"p99 {metrics['add_knowledge_p99_us']:.0f}us, "
+              f"knowledge mean {metrics['knowledge_mean']:.1f} "
+              f"max {metrics['knowledge_max']}, "
+              f"peak memory {metrics['peak_memory_kb']:.0f}KB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("options") != options:
+            sys.exit("Baseline was run with different options.")
+        thresholds = dict(THRESHOLDS)
+        thresholds.update(args.threshold)
+        regressions = compare(results, baseline, thresholds)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
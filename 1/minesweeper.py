@@ -1,37 +1,87 @@
+import collections
 import itertools
+import logging
+import math
 import random
 
+logger = logging.getLogger(__name__)
+
+# Search nodes allowed when counting the solutions of one frontier component
+EXACT_BUDGET = 20000
+
+# Solutions sampled from a component too large to count exactly
+SAMPLES = 64
+
+# Search nodes allowed per cell when sampling one solution of a component
+SAMPLE_NODES_PER_CELL = 4
+
 
 class Minesweeper():
     """
     Minesweeper game representation
     """
 
-    def __init__(self, height=8, width=8, mines=8):
+    def __init__(self, height=8, width=8, mines=8, seed=None):
 
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
-
-        # At first, player has found no mines
+        # Boards built from the same seed are identical
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # Add mines at distinct random cells, numbered row by row
+        cells = self.rng.sample(range(height * width), mines)
+        self.mines = {divmod(index, width) for index in cells}
+
+        # Initialize a field with those mines
+        self.board = [[False] * width for _ in range(height)]
+        for i, j in self.mines:
+            self.board[i][j] = True
+
+        # Count each cell's nearby mines once, one byte per cell
+        self.counts = self._count_nearby(cells)
+
+        # At first, player has found no mines and revealed no cells
         self.mines_found = set()
+        self.revealed = set()
+
+    def _count_nearby(self, cells):
+        """
+        Returns a bytearray holding, for each cell numbered row by row,
+        the number of mines within one row and column of it, given the
+        numbers of the cells that are mines.
+        """
+        height, width = self.height, self.width
+        grid = bytearray(height * width)
+        for index in cells:
+            grid[index] = 1
+
+        # Sum each cell with its left and right neighbors, row by row
+        zero = bytes(1)
+        rows = []
+        for i in range(height):
+            row = grid[i * width:(i + 1) * width]
+            rows.append([
+                a + b + c
+                for a, b, c in zip(zero + row[:-1], row, row[1:] + zero)
+            ])
+
+        # Then sum each of those with the rows above and below
+        empty = [0] * width
+        counts = bytearray(height * width)
+        for i in range(height):
+            above = rows[i - 1] if i > 0 else empty
+            below = rows[i + 1] if i + 1 < height else empty
+            counts[i * width:(i + 1) * width] = bytes(
+                a + b + c for a, b, c in zip(above, rows[i], below)
+            )
+
+        # A mine is not nearby itself
+        for index in cells:
+            counts[index] -= 1
+        return counts
 
     def print(self):
         """
@@ -58,24 +108,35 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        return self.counts[cell[0] * self.width + cell[1]]
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
+    def reveal(self, cell):
+        """
+        Reveals a safe cell and, if it has no nearby mines, every cell
+        connected to it through cells with no nearby mines, along with
+        the cells bordering that region.
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
+        Returns a dictionary mapping each newly revealed cell
+        to its number of nearby mines.
+        """
+        revealed = {}
+        stack = [cell]
+        while stack:
+            cell = stack.pop()
+            if cell in self.revealed:
+                continue
+            self.revealed.add(cell)
+            count = self.nearby_mines(cell)
+            revealed[cell] = count
 
-        return count
+            # Neighbors of a cell with no nearby mines are all safe
+            if count == 0:
+                i, j = cell
+                for x in range(max(0, i - 1), min(self.height, i + 2)):
+                    for y in range(max(0, j - 1), min(self.width, j + 2)):
+                        if (x, y) not in self.revealed:
+                            stack.append((x, y))
+        return revealed
 
     def won(self):
         """
@@ -89,56 +150,420 @@ class Sentence():
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    Cells are stored as the bits of an integer, cell (i, j) being bit
+    i * width + j, so that sentences are compared and combined with
+    integer operations. The bits are shifted down by `base`, the index
+    of the first cell, so masks stay small on large boards.
+    Sentences are immutable and can be used as set members or dict keys.
     """
 
-    def __init__(self, cells, count):
-        self.cells = set(cells)
-        self.count = count
+    __slots__ = ("base", "mask", "count", "width")
+
+    def __init__(self, cells, count, width=8):
+        mask = 0
+        for i, j in cells:
+            if i < 0 or not 0 <= j < width:
+                raise ValueError(f"cell {(i, j)} is not on a board {width} wide")
+            mask |= 1 << (i * width + j)
+        self._init(0, mask, count, width)
+
+    def _init(self, base, mask, count, width):
+        if mask:
+            shift = (mask & -mask).bit_length() - 1
+            base += shift
+            mask >>= shift
+        else:
+            base = 0
+        object.__setattr__(self, "base", base)
+        object.__setattr__(self, "mask", mask)
+        object.__setattr__(self, "count", count)
+        object.__setattr__(self, "width", width)
+
+    @classmethod
+    def from_mask(cls, base, mask, count, width=8):
+        """
+        Returns the sentence whose cells are the set bits of `mask`,
+        shifted up by `base`.
+        """
+        sentence = object.__new__(cls)
+        sentence._init(base, mask, count, width)
+        return sentence
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Sentence is immutable")
 
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        if not isinstance(other, Sentence):
+            return NotImplemented
+        return (self.mask == other.mask and self.base == other.base
+                and self.count == other.count and self.width == other.width)
+
+    def __hash__(self):
+        return hash((self.base, self.mask, self.count, self.width))
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __contains__(self, cell):
+        return bool(self._bit(cell))
 
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{set(self.cells)} = {self.count}"
+
+    def __repr__(self):
+        return f"Sentence({set(self.cells)!r}, {self.count!r}, width={self.width!r})"
+
+    def _bit(self, cell):
+        i, j = cell
+        if i < 0 or not 0 <= j < self.width:
+            return 0
+        index = i * self.width + j - self.base
+        if index < 0:
+            return 0
+        return self.mask & (1 << index)
+
+    def _aligned(self, other):
+        """
+        Returns the mask of `other` shifted to line up with this
+        sentence's mask, dropping cells that come before this sentence's.
+        """
+        shift = other.base - self.base
+        if shift >= 0:
+            return other.mask << shift
+        return other.mask >> -shift
+
+    @property
+    def cells(self):
+        """
+        Returns the set of cells in the sentence, as (i, j) tuples.
+        """
+        cells = set()
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            cells.add(divmod(self.base + low.bit_length() - 1, self.width))
+            mask ^= low
+        return frozenset(cells)
+
+    def issubset(self, other):
+        """
+        Returns whether every cell of this sentence is also in `other`.
+        """
+        if not self.mask:
+            return True
+        return (self.base >= other.base
+                and not other._aligned(self) & ~other.mask)
+
+    def __sub__(self, other):
+        """
+        Returns the sentence about the cells of this sentence that are
+        not in `other`, given that `other` is a subset of this sentence.
+        """
+        return Sentence.from_mask(
+            self.base, self.mask & ~self._aligned(other),
+            self.count - other.count, self.width
+        )
 
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
         """
-        mine_set = set()
-        for cell in self.cells:
-            if self.count == len(self.cells):
-                mine_set.add(cell)
-        return mine_set
+        if self.count and self.count == len(self):
+            return self.cells
+        return frozenset()
+
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
         """
-        safe_set = set()
-        for cell in self.cells:
-            if self.count == 0 :
-                safe_set.add(cell)
-        
-        return safe_set
+        if self.count == 0 and self.mask:
+            return self.cells
+        return frozenset()
+
     def mark_mine(self, cell):
         """
-        Updates internal knowledge representation given the fact that
+        Returns the sentence updated with the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            print("removed cell: "+  str(cell)+ " from sentence before : " +str(self.cells)  + "=" + str(self.count))
-            self.cells.remove(cell)
-            self.count -=1
-            print("sentence after : " +str(self.cells)  + "=" + str(self.count))
+        bit = self._bit(cell)
+        if not bit:
+            return self
+        return Sentence.from_mask(
+            self.base, self.mask ^ bit, self.count - 1, self.width
+        )
 
     def mark_safe(self, cell):
         """
-        Updates internal knowledge representation given the fact that
+        Returns the sentence updated with the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
- 
+        bit = self._bit(cell)
+        if not bit:
+            return self
+        return Sentence.from_mask(
+            self.base, self.mask ^ bit, self.count, self.width
+        )
+
+
+class KnowledgeBase():
+    """
+    Collection of sentences known to be true, indexed by the cells
+    they mention so that updates only touch the affected sentences
+    """
+
+    def __init__(self):
+
+        # Sentences by id, and the id of each distinct sentence
+        self.sentences = {}
+        self.ids = {}
+
+        # Ids of the sentences that mention each cell
+        self.index = {}
+
+        # Ids of sentences added or changed since `pop_dirty` was last called
+        self.dirty = set()
+
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def __iter__(self):
+        return iter(list(self.sentences.values()))
+
+    def __contains__(self, sentence):
+        return sentence in self.ids
+
+    def add(self, sentence):
+        """
+        Adds a sentence unless it is empty or an equal one is already
+        known, and returns the id under which it is stored (None if empty).
+        """
+        if not sentence:
+            return None
+        if sentence in self.ids:
+            return self.ids[sentence]
+        sid = self._next_id
+        self._next_id += 1
+        self.sentences[sid] = sentence
+        self.ids[sentence] = sid
+        for cell in sentence.cells:
+            self.index.setdefault(cell, set()).add(sid)
+        self.dirty.add(sid)
+        return sid
+
+    def remove(self, sid):
+        """
+        Removes the sentence stored under id `sid`.
+        """
+        sentence = self.sentences.pop(sid)
+        del self.ids[sentence]
+        for cell in sentence.cells:
+            ids = self.index[cell]
+            ids.discard(sid)
+            if not ids:
+                del self.index[cell]
+        self.dirty.discard(sid)
+
+    def containing(self, cell):
+        """
+        Returns the ids of all sentences that mention `cell`.
+        """
+        return self.index.get(cell, ())
+
+    def related(self, sentence):
+        """
+        Returns the sentences, other than `sentence` itself, that share
+        at least one cell with `sentence`.
+        """
+        ids = set()
+        for cell in sentence.cells:
+            ids.update(self.index.get(cell, ()))
+        return [
+            self.sentences[sid] for sid in ids
+            if self.sentences[sid] is not sentence
+        ]
+
+    def mark_mine(self, cell):
+        """
+        Marks `cell` as a mine in every sentence that mentions it.
+        """
+        self._update(cell, Sentence.mark_mine)
+
+    def mark_safe(self, cell):
+        """
+        Marks `cell` as safe in every sentence that mentions it.
+        """
+        self._update(cell, Sentence.mark_safe)
+
+    def _update(self, cell, mark):
+        for sid in self.index.pop(cell, ()):
+            sentence = mark(self.sentences[sid], cell)
+            del self.ids[self.sentences[sid]]
+
+            # A sentence that is now empty, or equals another one, is redundant
+            if not sentence or sentence in self.ids:
+                del self.sentences[sid]
+                for other in sentence.cells:
+                    ids = self.index[other]
+                    ids.discard(sid)
+                    if not ids:
+                        del self.index[other]
+                self.dirty.discard(sid)
+            else:
+                self.sentences[sid] = sentence
+                self.ids[sentence] = sid
+                self.dirty.add(sid)
+
+    def pop_dirty(self):
+        """
+        Returns the ids of sentences added or changed since the last call.
+        """
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+
+def search_component(cells, sentences, order, budget, record):
+    """
+    Depth-first search over assignments of mines to `cells` that satisfy
+    every sentence in `sentences`, trying the values returned by `order()`
+    for each cell in turn, and calling `record(assignment)` for each
+    solution found, where assignment[n] is 1 if cells[n] is a mine.
+    The search stops early if `record` returns True.
+
+    Returns False if more than `budget` search nodes were needed.
+    """
+    size = len(cells)
+    position = {cell: n for n, cell in enumerate(cells)}
+    need = [sentence.count for sentence in sentences]
+    left = [len(sentence) for sentence in sentences]
+    constraints = [[] for _ in cells]
+    for c, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            constraints[position[cell]].append(c)
+
+    assignment = [0] * size
+    values = [None] * size
+    values[0] = order()
+    nodes = 0
+    n = 0
+    while n >= 0:
+
+        # Once every value has been tried, undo the previous cell's value
+        if not values[n]:
+            n -= 1
+            if n >= 0:
+                for c in constraints[n]:
+                    need[c] += assignment[n]
+                    left[c] += 1
+            continue
+
+        nodes += 1
+        if nodes > budget:
+            return False
+
+        value = values[n].pop()
+        consistent = True
+        for c in constraints[n]:
+            need[c] -= value
+            left[c] -= 1
+            if need[c] < 0 or need[c] > left[c]:
+                consistent = False
+        if consistent:
+            assignment[n] = value
+            if n + 1 < size:
+                n += 1
+                values[n] = order()
+                continue
+            if record(assignment):
+                return True
+        for c in constraints[n]:
+            need[c] += value
+            left[c] += 1
+    return True
+
+
+def solve_component(cells, sentences, budget=EXACT_BUDGET, samples=SAMPLES,
+                    rng=random):
+    """
+    Counts the solutions of a frontier component by the number of mines
+    they place, returning a dictionary mapping each mine count k to
+    a pair (weight, tallies), where tallies[n] is how many of those
+    solutions place a mine in cells[n], and whether the count is exact.
+
+    If counting exactly would take more than `budget` search nodes,
+    solutions are sampled instead, using `rng`, and the weights are
+    sample counts. Each sample may take a share of the budget, or
+    SAMPLE_NODES_PER_CELL nodes per cell if that is more, so that samples
+    of large components can finish.
+    """
+    solutions = {}
+
+    def record(assignment):
+        mines = sum(assignment)
+        entry = solutions.get(mines)
+        if entry is None:
+            entry = solutions[mines] = [0, [0] * len(cells)]
+        entry[0] += 1
+        tallies = entry[1]
+        for n, value in enumerate(assignment):
+            tallies[n] += value
+
+    if search_component(cells, sentences, lambda: [0, 1], budget, record):
+        return solutions, True
+
+    # Too many solutions to count, so sample some with random value orders
+    solutions = {}
+
+    def order():
+        return rng.sample((0, 1), 2)
+
+    nodes = max(budget // samples, SAMPLE_NODES_PER_CELL * len(cells))
+    for _ in range(samples):
+        search_component(
+            cells, sentences, order, nodes,
+            lambda assignment: record(assignment) or True
+        )
+    return solutions, False
+
+
+def convolve(a, b):
+    """
+    Returns the distribution of the total mine count of two independent
+    distributions `a` and `b`, each mapping a mine count to a weight.
+    """
+    result = {}
+    for ka, wa in a.items():
+        for kb, wb in b.items():
+            result[ka + kb] = result.get(ka + kb, 0) + wa * wb
+    return result
+
+
+def log_comb(n, k):
+    """
+    Returns the natural logarithm of n choose k.
+    """
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+
+class LogTracer():
+    """
+    MinesweeperAI tracer that sends each event to a logger, attaching
+    the event name and its fields to the log record as `event` and
+    `fields` for handlers and formatters to use
+    """
+
+    def __init__(self, logger=logger):
+        self.logger = logger
+
+    def __call__(self, level, event, **fields):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(
+                level, "%s %s", event, fields,
+                extra={"event": event, "fields": fields}
+            )
 
 
 class MinesweeperAI():
@@ -146,12 +571,20 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, exact=False,
+                 safe_order="fifo", tracer=None, seed=None,
+                 inference="subset"):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # AIs given the same seed and the same moves make the same choices
+        self.rng = random.Random(seed)
+
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -159,8 +592,56 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Safe cells not yet played, in the order they were found safe.
+        # With safe_order "frontier", safe cells next to unexplored cells
+        # are queued separately and played first, as they reveal the most.
+        self.safe_order = safe_order
+        self.safe_moves = collections.deque()
+        self.frontier_moves = collections.deque()
+
+        # Sentences about the game known to be true
+        self.knowledge = KnowledgeBase()
+
+        # Number of sentences examined by the last call to add_knowledge
+        self.inference_steps = 0
+
+        # Whether to solve each group of connected sentences exactly
+        # after every move, and the solutions of each group by its sentences
+        self.exact = exact
+        self._solutions = {}
+
+        # How to combine sentences: "subset" draws new sentences from
+        # pairs where one is a subset of the other, while "linear" solves
+        # each group of connected sentences as a system of linear equations
+        # (which needs NumPy), skipping groups that yielded nothing before
+        self.inference = inference
+        self._settled = set()
+
+        # Called as tracer(level, event, **fields) on each inference event,
+        # for example with a LogTracer; None to trace nothing at no cost
+        self.tracer = tracer
+
+        # Neighbors of each cell, filled in as cells are first looked up
+        self._neighbors = {}
+
+    def neighbors(self, cell):
+        """
+        Returns the tuple of cells within one row and column of `cell`
+        that are on the board, not including the cell itself.
+        """
+        try:
+            return self._neighbors[cell]
+        except KeyError:
+            pass
+        i, j = cell
+        result = tuple(
+            (x, y)
+            for x in range(max(0, i - 1), min(self.height, i + 2))
+            for y in range(max(0, j - 1), min(self.width, j + 2))
+            if (x, y) != cell
+        )
+        self._neighbors[cell] = result
+        return result
 
     def mark_mine(self, cell):
         """
@@ -168,19 +649,34 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        print("cell added as mine: " + str(cell))
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        if self.tracer is not None:
+            self.tracer(logging.DEBUG, "mark_mine", cell=cell)
+        self.knowledge.mark_mine(cell)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell not in self.safes and cell not in self.moves_made:
+            if self.tracer is not None:
+                self.tracer(logging.DEBUG, "mark_safe", cell=cell)
+            if self.safe_order == "frontier" and self._informative(cell):
+                self.frontier_moves.append(cell)
+            else:
+                self.safe_moves.append(cell)
         self.safes.add(cell)
-        
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.knowledge.mark_safe(cell)
+
+    def _informative(self, cell):
+        """
+        Returns whether `cell` has a neighbor not yet known to be
+        safe or a mine, so that playing it could reveal something new.
+        """
+        return any(
+            neighbor not in self.safes and neighbor not in self.mines
+            for neighbor in self.neighbors(cell)
+        )
 
     def add_knowledge(self, cell, count):
         """
@@ -197,57 +693,91 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        self.moves_made.add(cell)
-        self.mark_safe(cell)
-       
-        i,j = cell 
-        sentence_set = set()
-        for h in range (0,3):
-            for k in range (0,3):
-                new_cell = i-1+h,j-1+k
-                if not (h == 1 and k == 1) and new_cell not in self.moves_made  and i-1+h>=0 and i-1+h<=7 and j-1+k>=0 and j-1+k<=7 :
-                    if new_cell in self.mines:
-                        count = count -1
-                        continue
-                    sentence_set.add(new_cell)
-        sentence = Sentence(sentence_set,count)
-        
-        if sentence in self.knowledge:
-                self.knowledge.remove(sentence)
-        self.knowledge.append(sentence)
-        extra_knowledge_list = []
-        for know in self.knowledge: 
-            
-            if know.cells.issubset(sentence.cells) and know.cells != sentence.cells:
-                extra_cells = sentence.cells - know.cells 
-                extra_count = sentence.count-know.count
-                extra_knowledge = Sentence(extra_cells,extra_count)
-                if extra_knowledge not in extra_knowledge_list:
-                    extra_knowledge_list.append(extra_knowledge)
-                    print("this is extra knowledge" + str(extra_knowledge))
-            if sentence.cells.issubset(know.cells) and know.cells != sentence.cells:    
-                extra_cells2 = know.cells-sentence.cells
-                extra_count2 = know.count-sentence.count
-                extra_knowledge2 = Sentence(extra_cells2,extra_count2)
-                if extra_knowledge2 not in extra_knowledge_list:
-                    extra_knowledge_list.append(extra_knowledge2)
-                    print("this is extra knowledge2" + str(extra_knowledge2))
-            
-        self.knowledge = self.knowledge + extra_knowledge_list        
-               
-                
-        
-        for know2 in self.knowledge:                 #BURA TEHLIKELİ BURAYA BAK TEKRAR
-            safe_set = know2.known_safes()
-            mine_set = know2.known_mines()
-            for cell2 in safe_set:
-                print("adding this new safe cell: " + str(cell2))
-                self.mark_safe(cell2)
-                
-            for cell3 in mine_set:
-                self.mark_mine(cell3)
-               
-        print("These are known mines:" + str(self.mines))
+        self.add_knowledge_batch({cell: count})
+
+    def add_knowledge_batch(self, revealed):
+        """
+        Called when the Minesweeper board reveals several safe cells at
+        once, with `revealed` mapping each cell to how many neighboring
+        cells have mines in them, as returned by Minesweeper.reveal.
+
+        Learns from every cell as add_knowledge does, but draws
+        conclusions from the new sentences together in a single pass.
+        """
+        for cell in revealed:
+            self.moves_made.add(cell)
+            self.mark_safe(cell)
+
+        for cell, count in revealed.items():
+            sentence_set = set()
+            for new_cell in self.neighbors(cell):
+                if new_cell in self.moves_made or new_cell in self.safes:
+                    continue
+                if new_cell in self.mines:
+                    count = count -1
+                    continue
+                sentence_set.add(new_cell)
+            self.knowledge.add(Sentence(sentence_set, count, self.width))
+
+        self.inference_steps = self.infer()
+        if self.inference == "linear":
+            while self.infer_linear():
+                self.inference_steps += self.infer()
+        if self.exact:
+            while self.infer_exactly():
+                self.inference_steps += self.infer()
+        if self.tracer is not None:
+            self.tracer(
+                logging.INFO, "add_knowledge", cells=len(revealed),
+                steps=self.inference_steps, sentences=len(self.knowledge),
+                mines=len(self.mines), safes=len(self.safes)
+            )
+
+    def infer(self):
+        """
+        Draws every conclusion that follows from the knowledge base,
+        re-examining only sentences added or changed since the last step,
+        until nothing new can be concluded.
+
+        Returns the number of sentences examined.
+        """
+        steps = 0
+        knowledge = self.knowledge
+        pending = knowledge.pop_dirty()
+        while pending:
+            for sid in pending:
+
+                # The sentence may have been dropped since it was changed
+                sentence = knowledge.sentences.get(sid)
+                if sentence is None:
+                    continue
+                steps += 1
+
+                # Marking every cell of a sentence empties and drops it
+                safes = sentence.known_safes()
+                mines = sentence.known_mines()
+                if safes or mines:
+                    for safe in safes:
+                        self.mark_safe(safe)
+                    for mine in mines:
+                        self.mark_mine(mine)
+                    continue
+
+                if self.inference != "subset":
+                    continue
+
+                # Only sentences sharing a cell can be a subset or superset
+                size = len(sentence)
+                for other in knowledge.related(sentence):
+                    other_size = len(other)
+                    if other_size < size and other.issubset(sentence):
+                        knowledge.add(sentence - other)
+                    elif size < other_size and sentence.issubset(other):
+                        knowledge.add(other - sentence)
+
+            pending = knowledge.pop_dirty()
+        return steps
+
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
@@ -257,16 +787,23 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        print("these are unplayed safe moves:"  + str(self.safes - self.moves_made))
-        if len(self.safes) == 0:
-            return None
-        
-        for safe_move in self.safes:
-            
-            if safe_move not in self.moves_made:
-                return safe_move 
+        # Cells that no longer reveal anything wait with the others
+        frontier = self.frontier_moves
+        while frontier:
+            if frontier[0] in self.moves_made:
+                frontier.popleft()
+            elif not self._informative(frontier[0]):
+                self.safe_moves.append(frontier.popleft())
+            else:
+                return frontier[0]
+
+        # Cells may have been played without the AI choosing them
+        queue = self.safe_moves
+        while queue and queue[0] in self.moves_made:
+            queue.popleft()
+        if queue:
+            return queue[0]
         return None
-    
 
     def make_random_move(self):
         """
@@ -275,15 +812,274 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        if len(self.moves_made) == 81:
+        total = self.height * self.width
+        if len(self.moves_made) + len(self.mines) >= total:
             return None
-        total_moves = set()
-        for i in range (8):
-            for j in range(8):
-                total_moves.add((i,j))
-                
-        total_moves = total_moves - self.moves_made   
-        total_moves = total_moves - self.mines 
+
+        # While most of the board is unexplored, a few random draws find
+        # a candidate without building the set of every remaining cell
+        for _ in range(32):
+            index = self.rng.randrange(total)
+            move = divmod(index, self.width)
+            if move not in self.moves_made and move not in self.mines:
+                return move
+
+        # Otherwise choose among the remaining cells directly
+        total_moves = [
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if (i, j) not in self.moves_made and (i, j) not in self.mines
+        ]
         if len(total_moves) == 0:
-            return None  
-        return total_moves.pop()
+            return None
+        return self.rng.choice(total_moves)
+
+    def make_guess_move(self):
+        """
+        Returns a move to make on the Minesweeper board when no move
+        is known to be safe, choosing the unexplored cell that is least
+        likely to be a mine given the AI's knowledge.
+        """
+        move = self.make_safe_move()
+        if move is not None:
+            return move
+
+        probabilities, other = self.mine_probabilities()
+        best = min(probabilities, key=probabilities.get, default=None)
+        if best is not None and (other is None or probabilities[best] <= other):
+            move, risk = best, probabilities[best]
+        else:
+            move, risk = self._unconstrained_move(), other
+        if self.tracer is not None:
+            self.tracer(logging.INFO, "guess", cell=move, risk=risk)
+        return move
+
+    def components(self):
+        """
+        Partitions the knowledge base into groups of sentences that share
+        no cells with other groups, and returns a list of (cells, sentences)
+        pairs, one for each group.
+        """
+        knowledge = self.knowledge
+        seen = set()
+        components = []
+        for sid in knowledge.sentences:
+            if sid in seen:
+                continue
+            seen.add(sid)
+            stack = [sid]
+            cells = []
+            sentences = []
+            cells_seen = set()
+            while stack:
+                sentence = knowledge.sentences[stack.pop()]
+                sentences.append(sentence)
+                for cell in sentence.cells:
+                    if cell in cells_seen:
+                        continue
+                    cells_seen.add(cell)
+                    cells.append(cell)
+                    for other in knowledge.containing(cell):
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append(other)
+            components.append((cells, sentences))
+        return components
+
+    def solve(self):
+        """
+        Solves each group of connected sentences in the knowledge base
+        with solve_component, returning a list of (cells, solutions, exact)
+        triples. A group's solutions are reused until any of its
+        sentences change.
+        """
+        cache = {}
+        results = []
+        for cells, sentences in self.components():
+            key = frozenset(sentences)
+            result = self._solutions.get(key)
+            if result is None:
+                solutions, exact = solve_component(
+                    cells, sentences, rng=self.rng
+                )
+                result = (cells, solutions, exact)
+            cache[key] = result
+            results.append(result)
+
+        # Forget the solutions of groups that no longer exist
+        self._solutions = cache
+        return results
+
+    def infer_linear(self):
+        """
+        Marks every cell that linear.forced_cells finds to be safe or
+        a mine in some group of connected sentences, solving only groups
+        that changed since they last yielded nothing.
+        Returns whether any cell was marked.
+        """
+        from linear import forced_cells
+
+        marked = False
+        settled = set()
+        for cells, sentences in self.components():
+            key = frozenset(sentences)
+            if key in self._settled:
+                settled.add(key)
+                continue
+            safes, mines = forced_cells(cells, sentences)
+            for safe in safes:
+                self.mark_safe(safe)
+            for mine in mines:
+                self.mark_mine(mine)
+            if safes or mines:
+                marked = True
+            else:
+                settled.add(key)
+        self._settled = settled
+        return marked
+
+    def infer_exactly(self):
+        """
+        Marks every cell that is safe in all solutions, or a mine in all
+        solutions, of a group of connected sentences that could be solved
+        exactly. Returns whether any cell was marked.
+        """
+        marked = False
+        for cells, solutions, exact in self.solve():
+            if not exact or not solutions:
+                continue
+            total = sum(count for count, _ in solutions.values())
+            for n, cell in enumerate(cells):
+                mines = sum(tallies[n] for _, tallies in solutions.values())
+                if mines == 0:
+                    self.mark_safe(cell)
+                    marked = True
+                elif mines == total:
+                    self.mark_mine(cell)
+                    marked = True
+        return marked
+
+    def mine_probabilities(self):
+        """
+        Returns a dictionary mapping each cell mentioned by the knowledge
+        base to the probability that it is a mine, along with the
+        probability that any other unexplored cell is a mine (None if
+        there are no other unexplored cells).
+
+        Each group of connected sentences is solved separately, and the
+        groups are combined using the total number of mines, if known,
+        weighting each count of frontier mines by the number of ways
+        to place the remaining mines on the other unexplored cells.
+
+        Cells of a group for which no solution could be found within
+        the search budget get the average density of their sentences.
+        """
+        components = []
+        unsolved = {}
+        for cells, solutions, _ in self.solve():
+            total = sum(weight for weight, _ in solutions.values())
+            if total:
+                components.append((cells, solutions, total))
+                continue
+            for cell in cells:
+                densities = [
+                    sentence.count / len(sentence)
+                    for sentence in (
+                        self.knowledge.sentences[sid]
+                        for sid in self.knowledge.containing(cell)
+                    )
+                ]
+                unsolved[cell] = sum(densities) / len(densities)
+
+        frontier = sum(len(cells) for cells, _, _ in components) + len(unsolved)
+        others = (self.height * self.width - len(self.safes)
+                  - len(self.mines) - frontier)
+
+        # Distribution of mines over the components before and after each
+        distributions = [
+            {k: weight / total for k, (weight, _) in solutions.items()}
+            for _, solutions, total in components
+        ]
+        prefix = [{0: 1.0}]
+        for distribution in distributions:
+            prefix.append(convolve(prefix[-1], distribution))
+        suffix = [{0: 1.0}]
+        for distribution in reversed(distributions):
+            suffix.append(convolve(suffix[-1], distribution))
+        suffix.reverse()
+
+        # Weight of each number of mines on the frontier, relative to the
+        # most likely one, from the ways to place the remaining mines
+        prior = None
+        if self.total_mines is not None:
+            remaining = (self.total_mines - len(self.mines)
+                         - round(sum(unsolved.values())))
+            logs = {
+                k: log_comb(others, remaining - k)
+                for k in prefix[-1] if 0 <= remaining - k <= others
+            }
+            if logs:
+                top = max(logs.values())
+                prior = {k: math.exp(log - top) for k, log in logs.items()}
+
+        def weight(k):
+            if prior is None:
+                return 1.0
+            return prior.get(k, 0.0)
+
+        probabilities = dict(unsolved)
+        for n, (cells, solutions, total) in enumerate(components):
+            rest = convolve(prefix[n], suffix[n + 1])
+            tallies = [0.0] * len(cells)
+            norm = 0.0
+            for k, (count, counts) in solutions.items():
+                w = sum(
+                    p * weight(k + rest_k) for rest_k, p in rest.items()
+                ) / total
+                norm += w * count
+                for m in range(len(cells)):
+                    tallies[m] += w * counts[m]
+            for m, cell in enumerate(cells):
+                probabilities[cell] = tallies[m] / norm if norm else 0.5
+
+        if others <= 0:
+            return probabilities, None
+
+        # Without a mine total, assume the frontier's density elsewhere
+        if prior is None:
+            if not probabilities:
+                return probabilities, 0.5
+            return probabilities, sum(probabilities.values()) / len(probabilities)
+
+        # Otherwise spread the expected number of remaining mines
+        expected = 0.0
+        norm = 0.0
+        for k, p in prefix[-1].items():
+            norm += p * weight(k)
+            expected += p * weight(k) * (remaining - k)
+        return probabilities, min(1.0, expected / norm / others)
+
+    def _unconstrained_move(self):
+        """
+        Returns a random unexplored cell not mentioned by the knowledge base
+        and not known to be safe or a mine, or None if there is none.
+        """
+        def candidate(move):
+            return (move not in self.safes and move not in self.mines
+                    and move not in self.knowledge.index)
+
+        total = self.height * self.width
+        for _ in range(32):
+            move = divmod(self.rng.randrange(total), self.width)
+            if candidate(move):
+                return move
+        moves = [
+            (i, j)
+            for i in range(self.height)
+            for j in range(self.width)
+            if candidate((i, j))
+        ]
+        if len(moves) == 0:
+            return None
+        return self.rng.choice(moves)
@@ -0,0 +1,177 @@
+import argparse
+import cProfile
+import pstats
+import struct
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# A trace starts with a header holding the magic bytes, format version,
+# flags, height, width, number of mines, seed and number of moves,
+# followed by each move as its cell number and outcome
+HEADER = struct.Struct("<4sBBIIIqI")
+MOVE = struct.Struct("<IB")
+MAGIC = b"MSWT"
+VERSION = 1
+
+# Flags describing how the game was played
+FLOOD = 1
+EXACT = 2
+LINEAR = 4
+
+# Outcome of a move that hit a mine; other outcomes are nearby mine counts
+MINE = 255
+
+
+class GameTrace():
+    """
+    Compact record of a game of Minesweeper: the seed the board was
+    built from, and every move made along with its outcome
+    """
+
+    def __init__(self, height, width, mines, seed, flood=False, exact=False,
+                 inference="subset"):
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.seed = seed
+        self.flood = flood
+        self.exact = exact
+        self.inference = inference
+
+        # List of (cell, outcome) pairs, in the order the moves were made
+        self.moves = []
+
+    def add(self, cell, outcome):
+        """
+        Records a move on `cell`, whose outcome is either MINE
+        or the number of mines nearby.
+        """
+        self.moves.append((cell, outcome))
+
+    def to_bytes(self):
+        """
+        Returns the trace encoded in its binary format.
+        """
+        flags = (
+            (FLOOD if self.flood else 0) | (EXACT if self.exact else 0)
+            | (LINEAR if self.inference == "linear" else 0)
+        )
+        data = [HEADER.pack(
+            MAGIC, VERSION, flags, self.height, self.width, self.mines,
+            self.seed, len(self.moves)
+        )]
+        for (i, j), outcome in self.moves:
+            data.append(MOVE.pack(i * self.width + j, outcome))
+        return b"".join(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Returns the trace encoded in `data`.
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("truncated game trace")
+        magic, version, flags, height, width, mines, seed, count = (
+            HEADER.unpack_from(data)
+        )
+        if magic != MAGIC:
+            raise ValueError("not a game trace")
+        if version != VERSION:
+            raise ValueError(f"unsupported game trace version: {version}")
+        if len(data) != HEADER.size + count * MOVE.size:
+            raise ValueError("truncated game trace")
+
+        trace = cls(height, width, mines, seed,
+                    flood=bool(flags & FLOOD), exact=bool(flags & EXACT),
+                    inference="linear" if flags & LINEAR else "subset")
+        for index, outcome in MOVE.iter_unpack(data[HEADER.size:]):
+            trace.add(divmod(index, width), outcome)
+        return trace
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def ai_seed(seed):
+    """
+    Returns the seed for a MinesweeperAI playing on the board built from
+    `seed`, such that the AI's random choices are unrelated to the board's.
+    """
+    return f"ai-{seed}"
+
+
+def replay(trace, tracer=None):
+    """
+    Rebuilds the board of a game from its seed, and feeds every recorded
+    move to a new MinesweeperAI, checking each outcome against the trace.
+
+    Returns the AI and the time it took to learn from each move.
+    """
+    game = Minesweeper(
+        height=trace.height, width=trace.width, mines=trace.mines,
+        seed=trace.seed
+    )
+    ai = MinesweeperAI(
+        height=trace.height, width=trace.width, mines=trace.mines,
+        exact=trace.exact, tracer=tracer, seed=ai_seed(trace.seed),
+        inference=trace.inference
+    )
+
+    latencies = []
+    for move, outcome in trace.moves:
+        if game.is_mine(move):
+            if outcome != MINE:
+                raise ValueError(f"board does not match trace at {move}")
+            break
+        if trace.flood:
+            revealed = game.reveal(move)
+        else:
+            revealed = {move: game.nearby_mines(move)}
+        if revealed.get(move) != outcome:
+            raise ValueError(f"board does not match trace at {move}")
+
+        start = time.perf_counter()
+        ai.add_knowledge_batch(revealed)
+        latencies.append(time.perf_counter() - start)
+    return ai, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded Minesweeper game through MinesweeperAI."
+    )
+    parser.add_argument("trace", help="game trace file")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile the replay and print the top functions")
+    args = parser.parse_args()
+
+    trace = GameTrace.load(args.trace)
+    print(f"Board: {trace.height}x{trace.width}, {trace.mines} mines, "
+          f"seed {trace.seed}, {trace.inference} inference")
+
+    if args.profile:
+        profile = cProfile.Profile()
+        ai, latencies = profile.runcall(replay, trace)
+    else:
+        ai, latencies = replay(trace)
+
+    lost = bool(trace.moves) and trace.moves[-1][1] == MINE
+    print(f"Moves: {len(trace.moves)} ({'lost' if lost else 'not lost'})")
+    print(f"Learning time: {sum(latencies) * 1e3:.1f}ms, "
+          f"slowest move {max(latencies, default=0) * 1e3:.1f}ms")
+    print(f"Knowledge: {len(ai.knowledge)} sentences, "
+          f"{len(ai.mines)} mines and {len(ai.safes)} safes known")
+
+    if args.profile:
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(20)
+
+
+if __name__ == "__main__":
+    main()
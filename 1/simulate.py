@@ -0,0 +1,237 @@
+import argparse
+import functools
+import logging
+import multiprocessing
+import os
+import time
+
+from minesweeper import LogTracer, Minesweeper, MinesweeperAI
+from replay import MINE, GameTrace, ai_seed
+
+
+def play_game(seed, height=8, width=8, mines=8, guess="random",
+              exact=False, safe_order="fifo", flood=False, trace=False,
+              record=False, inference="subset"):
+    """
+    Play one game of Minesweeper end to end with a MinesweeperAI,
+    without a display, on the board generated from `seed`.
+    When no safe move is known, the AI makes a random move if `guess` is
+    "random", or its least risky move if `guess` is "probability".
+    If `exact` is true, the AI also solves its knowledge exactly.
+    `inference` is how the AI combines sentences, "subset" or "linear".
+    `safe_order` is the order in which the AI plays known safe cells.
+    If `flood` is true, revealing a cell with no nearby mines also reveals
+    the region around it, and the AI learns from the whole region at once.
+    If `trace` is true, the AI's inference events are logged.
+    If `record` is true, the result includes a GameTrace of the game.
+
+    Returns a dictionary describing the outcome of the game:
+    the seed, whether the AI won, how many moves it made, the time
+    taken by each move (choosing it and learning from it), and for
+    each move learned from, the time spent learning, the number of
+    inference steps taken and the size of the knowledge base after.
+    """
+
+    # Seed the board and the AI so that every game can be reproduced
+    game = Minesweeper(height=height, width=width, mines=mines, seed=seed)
+    ai = MinesweeperAI(
+        height=height, width=width, mines=mines, exact=exact,
+        safe_order=safe_order, tracer=LogTracer() if trace else None,
+        seed=ai_seed(seed), inference=inference
+    )
+    moves = GameTrace(height, width, mines, seed, flood=flood, exact=exact,
+                      inference=inference)
+
+    safe_cells = height * width - mines
+    latencies = []
+    learning = []
+    steps = []
+    knowledge = []
+    won = False
+
+    while True:
+        start = time.perf_counter()
+
+        # Choose a move the same way the runner's AI button does
+        if guess == "probability":
+            move = ai.make_guess_move()
+        else:
+            move = ai.make_safe_move()
+            if move is None:
+                move = ai.make_random_move()
+        if move is None:
+            break
+
+        # Hitting a mine ends the game
+        if game.is_mine(move):
+            latencies.append(time.perf_counter() - start)
+            moves.add(move, MINE)
+            break
+
+        # Reveal the move on the board first, so that only the AI's
+        # learning is timed
+        if flood:
+            revealed = game.reveal(move)
+        else:
+            revealed = {move: game.nearby_mines(move)}
+            game.revealed.add(move)
+        learn = time.perf_counter()
+        if flood:
+            ai.add_knowledge_batch(revealed)
+        else:
+            ai.add_knowledge(move, revealed[move])
+        end = time.perf_counter()
+        latencies.append(end - start)
+        learning.append(end - learn)
+        steps.append(ai.inference_steps)
+        knowledge.append(len(ai.knowledge))
+        moves.add(move, game.nearby_mines(move))
+
+        # The game is won once every safe cell has been revealed
+        if len(game.revealed) == safe_cells:
+            won = True
+            break
+
+    result = {
+        "seed": seed,
+        "won": won,
+        "moves": len(latencies),
+        "latencies": latencies,
+        "learning": learning,
+        "steps": steps,
+        "knowledge": knowledge
+    }
+    if record:
+        result["trace"] = moves
+    return result
+
+
+def simulate(games, height=8, width=8, mines=8, guess="random",
+             exact=False, safe_order="fifo", flood=False, trace=False,
+             record=False, inference="subset", processes=None, seed=0):
+    """
+    Play `games` games across a pool of `processes` worker processes,
+    using the seeds `seed`, `seed + 1`, ..., and return the list of
+    game results along with the total wall-clock time taken.
+    """
+    play = functools.partial(
+        play_game, height=height, width=width, mines=mines, guess=guess,
+        exact=exact, safe_order=safe_order, flood=flood, trace=trace,
+        record=record, inference=inference
+    )
+    seeds = range(seed, seed + games)
+
+    start = time.perf_counter()
+    if processes == 1:
+        results = [play(s) for s in seeds]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            chunksize = max(1, games // (4 * (processes or os.cpu_count() or 1)))
+            results = list(pool.imap_unordered(play, seeds, chunksize))
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda result: result["seed"])
+    return results, elapsed
+
+
+def percentile(values, q):
+    """
+    Return the `q`th percentile (0 <= q <= 100) of a sorted list of values,
+    using the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * q // 100))
+    return values[min(len(values), int(rank)) - 1]
+
+
+def report(results, elapsed):
+    """
+    Print throughput, win rate and per-move latency percentiles
+    for a batch of game results.
+    """
+    games = len(results)
+    wins = sum(result["won"] for result in results)
+    latencies = sorted(
+        latency for result in results for latency in result["latencies"]
+    )
+
+    print(f"Games:      {games}")
+    print(f"Moves:      {len(latencies)}")
+    print(f"Elapsed:    {elapsed:.2f}s")
+    print(f"Games/sec:  {games / elapsed if elapsed else 0.0:.1f}")
+    print(f"Win rate:   {wins / games if games else 0.0:.2%}")
+    steps = [step for result in results for step in result["steps"]]
+    print("Inference steps per move: "
+          f"mean {sum(steps) / len(steps) if steps else 0.0:.1f}, "
+          f"max {max(steps, default=0)}")
+    print("Move latency:")
+    for q in (50, 90, 99, 100):
+        label = "max" if q == 100 else f"p{q}"
+        print(f"  {label:>4}: {percentile(latencies, q) * 1e6:.0f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Minesweeper games headlessly with MinesweeperAI."
+    )
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--guess", choices=["random", "probability"],
+                        default="random",
+                        help="how to move when no safe move is known")
+    parser.add_argument("--exact", action="store_true",
+                        help="solve each group of connected sentences exactly")
+    parser.add_argument("--inference", choices=["subset", "linear"],
+                        default="subset",
+                        help="how to combine sentences (linear needs NumPy)")
+    parser.add_argument("--safe-order", choices=["fifo", "frontier"],
+                        default="fifo",
+                        help="order in which to play known safe cells")
+    parser.add_argument("--flood", action="store_true",
+                        help="reveal regions with no nearby mines at once")
+    parser.add_argument("--record", metavar="DIR",
+                        help="save traces of lost games and the slowest game")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="log AI moves (-v) or all inference events (-vv)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    if args.games < 1:
+        parser.error("there must be at least one game")
+    if args.mines >= args.height * args.width:
+        parser.error("there must be fewer mines than cells")
+    if args.processes is not None and args.processes < 1:
+        parser.error("there must be at least one worker process")
+    if args.verbose:
+        logging.basicConfig(
+            level=logging.DEBUG if args.verbose > 1 else logging.INFO
+        )
+
+    results, elapsed = simulate(
+        args.games, height=args.height, width=args.width, mines=args.mines,
+        guess=args.guess, exact=args.exact, safe_order=args.safe_order,
+        flood=args.flood, trace=args.verbose > 0,
+        record=args.record is not None, inference=args.inference,
+        processes=args.processes,
+        seed=args.seed
+    )
+    report(results, elapsed)
+
+    if args.record is not None:
+        os.makedirs(args.record, exist_ok=True)
+        slowest = max(results, key=lambda result: sum(result["latencies"]))
+        for result in results:
+            if result is slowest or not result["won"]:
+                result["trace"].save(
+                    os.path.join(args.record, f"game-{result['seed']}.mswt")
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import math
+import multiprocessing
+import os
+import statistics
+
+from simulate import play_game
+
+# MinesweeperAI variants, as the options simulate.play_game passes on
+STRATEGIES = {
+    "subset": {},
+    "exact": {"exact": True},
+    "probability": {"guess": "probability"},
+    "exact+probability": {"exact": True, "guess": "probability"},
+    "linear": {"inference": "linear"}
+}
+
+# Normal quantile for 95% confidence intervals
+Z = 1.96
+
+
+def play(task):
+    """
+    Plays the game described by a (strategy, seed, height, width, mines)
+    task, and returns the strategy name along with the game's result.
+    """
+    strategy, seed, height, width, mines = task
+    result = play_game(
+        seed, height=height, width=width, mines=mines, **STRATEGIES[strategy]
+    )
+    return strategy, result
+
+
+def wilson(successes, trials):
+    """
+    Returns the 95% Wilson score interval for a success rate.
+    """
+    if not trials:
+        return 0.0, 0.0
+    p = successes / trials
+    denominator = 1 + Z ** 2 / trials
+    center = (p + Z ** 2 / (2 * trials)) / denominator
+    spread = Z * math.sqrt(
+        p * (1 - p) / trials + Z ** 2 / (4 * trials ** 2)
+    ) / denominator
+    return center - spread, center + spread
+
+
+def mean_interval(values):
+    """
+    Returns the mean of `values` and the half-width of its
+    95% normal confidence interval.
+    """
+    if not values:
+        return 0.0, 0.0
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, 0.0
+    return mean, Z * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def tournament(strategies, games, height=8, width=8, mines=8,
+               processes=None, seed=0):
+    """
+    Plays every strategy on the same `games` boards, built from seeds
+    `seed`, `seed + 1`, ..., across a pool of worker processes, and
+    returns a dictionary mapping each strategy to its list of results.
+    """
+    tasks = [
+        (strategy, s, height, width, mines)
+        for s in range(seed, seed + games)
+        for strategy in strategies
+    ]
+    results = {strategy: [] for strategy in strategies}
+    with multiprocessing.Pool(processes) as pool:
+        chunksize = max(1, len(tasks) // (4 * (processes or os.cpu_count() or 1)))
+        for strategy, result in pool.imap_unordered(play, tasks, chunksize):
+            results[strategy].append(result)
+    return results
+
+
+def summarize(results):
+    """
+    Returns a row of statistics for one strategy's game results:
+    win rate and its interval, moves per second, and knowledge base size.
+    """
+    wins = sum(result["won"] for result in results)
+    low, high = wilson(wins, len(results))
+    speeds = [
+        result["moves"] / sum(result["latencies"])
+        for result in results if sum(result["latencies"]) > 0
+    ]
+    speed, speed_error = mean_interval(speeds)
+    sizes = [max(result["knowledge"], default=0) for result in results]
+    size, size_error = mean_interval(sizes)
+    growth = [
+        max(result["knowledge"]) / len(result["knowledge"])
+        for result in results if result["knowledge"]
+    ]
+    return {
+        "games": len(results),
+        "win_rate": wins / len(results) if results else 0.0,
+        "win_interval": (low, high),
+        "moves_per_sec": (speed, speed_error),
+        "knowledge_max": (size, size_error),
+        "knowledge_growth": statistics.fmean(growth) if growth else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare MinesweeperAI strategies on identical boards."
+    )
+    parser.add_argument("strategies", nargs="*", metavar="strategy",
+                        help=f"one of {', '.join(STRATEGIES)} (default: all)")
+    parser.add_argument("-n", "--games", type=int, default=200)
+    parser.add_argument("--height", type=int, default=16)
+    parser.add_argument("--width", type=int, default=30)
+    parser.add_argument("--mines", type=int, default=99)
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first board")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    for strategy in args.strategies:
+        if strategy not in STRATEGIES:
+            parser.error(f"unknown strategy: {strategy}")
+    if args.mines >= args.height * args.width:
+        parser.error("there must be fewer mines than cells")
+    if args.processes is not None and args.processes < 1:
+        parser.error("there must be at least one worker process")
+
+    results = tournament(
+        args.strategies or list(STRATEGIES), args.games,
+        height=args.height, width=args.width, mines=args.mines,
+        processes=args.processes, seed=args.seed
+    )
+
+    print(f"{args.games} boards of {args.height}x{args.width} "
+          f"with {args.mines} mines, 95% confidence intervals")
+    print(f"{'Strategy':<20}{'Win rate':>24}{'Moves/sec':>20}"
+          f"{'Max knowledge':>18}{'Growth/move':>14}")
+    for strategy, games in results.items():
+        row = summarize(games)
+        low, high = row["win_interval"]
+        speed, speed_error = row["moves_per_sec"]
+        size, size_error = row["knowledge_max"]
+        print(f"{strategy:<20}"
+              f"{row['win_rate']:>9.1%} [{low:5.1%}, {high:5.1%}]"
+              f"{speed:>12.0f} ±{speed_error:<6.0f}"
+              f"{size:>11.1f} ±{size_error:<5.1f}"
+              f"{row['knowledge_growth']:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
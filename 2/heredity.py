@@ -1,7 +1,16 @@
+import argparse
 import csv
 import itertools
+import math
+import multiprocessing
+import os
 import sys
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,30 +45,216 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Largest number of joint probabilities computed at once by array engines
+BLOCK = 2 ** 16
+
+# Shards of the enumeration given to each worker process, on average
+SHARDS_PER_PROCESS = 8
+
+# Samples drawn by sampling engines unless given on the command line
+SAMPLES = 10000
+
+# Gibbs sampling chains run side by side, and sweeps discarded from each
+CHAINS = 32
+BURN_IN = 50
+
+# Effective samples below which likelihood weighting estimates are unreliable
+MIN_EFFECTIVE_SAMPLES = 100
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        description="Infer gene and trait probabilities in a family."
+    )
+    parser.add_argument("data", help="CSV file of people")
+    parser.add_argument("--engine", choices=list(ENGINES), default="enumerate",
+                        help="how to compute the probabilities")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="worker processes for the parallel engine "
+                             "(default: one per CPU)")
+    parser.add_argument("-n", "--samples", type=int, default=SAMPLES,
+                        help="samples drawn by sampling engines")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for sampling engines")
+    parser.add_argument("--log", action="store_true",
+                        help="add up log-probabilities, for large families "
+                             "(enumerate and parallel engines)")
+    parser.add_argument("--mutation", type=float, default=None,
+                        help="probability of a gene mutating when passed on "
+                             f"(default: {PROBS['mutation']})")
+    args = parser.parse_args()
+    if args.samples < 1:
+        parser.error("there must be at least one sample")
+    if args.mutation is not None and not 0 <= args.mutation <= 1:
+        parser.error("the mutation probability must be between 0 and 1")
+    if args.engine == "gibbs" and args.samples < 2:
+        parser.error("Gibbs sampling needs at least two samples, "
+                     "one for each of two chains")
+    if args.log and "log" not in ENGINE_OPTIONS.get(args.engine, []):
+        parser.error(f"the {args.engine} engine does not support --log")
+    if args.engine in NUMPY_ENGINES and np is None:
+        sys.exit(f"The {args.engine} engine requires NumPy.")
+    people = load_data(args.data)
+    tables = TABLES
+    if args.mutation is not None:
+        tables = compile_tables(dict(PROBS, mutation=args.mutation))
 
     # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    options = {
+        option: getattr(args, option)
+        for option in ENGINE_OPTIONS.get(args.engine, [])
+    }
+    errors = None
+    diagnostics = {}
+    if args.engine in SAMPLING_ENGINES:
+        errors = empty_probabilities(people)
+        options["errors"] = errors
+        options["diagnostics"] = diagnostics
+    probabilities = ENGINES[args.engine](people, tables=tables, **options)
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities, log=options.get("log", False))
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    error = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {error:.4f}")
+
+    if "samples" in diagnostics:
+        print(f"Samples: {diagnostics['samples']}")
+    if "effective_samples" in diagnostics:
+        effective = diagnostics["effective_samples"]
+        print(f"Effective samples: {effective:.1f}")
+        if effective < MIN_EFFECTIVE_SAMPLES:
+            print(f"Warning: fewer than {MIN_EFFECTIVE_SAMPLES} effective "
+                  "samples, so estimates and errors are unreliable; "
+                  "draw more samples or use --engine gibbs", file=sys.stderr)
+
+
+def load_data(filename):
+    """
+    Load gene and trait data from a file into a dictionary.
+    File assumed to be a CSV containing fields name, mother, father, trait.
+    mother, father must both be blank, or both be valid names in the CSV.
+    trait should be 0 or 1 if trait is known, blank otherwise.
+    """
+    data = dict()
+    with open(filename) as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            name = row["name"]
+            data[name] = {
+                "name": name,
+                "mother": row["mother"] or None,
+                "father": row["father"] or None,
+                "trait": (True if row["trait"] == "1" else
+                          False if row["trait"] == "0" else None)
+            }
+    return data
+
+
+def compile_tables(probs):
+    """
+    Return the inheritance model in `probs`, shaped like PROBS, as lookup
+    tables indexed by gene counts and traits:
+        * "gene"[g] is the probability that someone without parents has g
+          copies of the gene,
+        * "child"[m][f][g] is the probability that a child has g copies
+          when their mother has m copies and their father has f copies, and
+        * "trait"[g][t] is the probability of having the trait, if t is
+          True (1), or not, if t is False (0), with g copies of the gene,
+    along with "log_gene", "log_child" and "log_trait" holding the
+    natural logarithms of each table.
+
+    Raises ValueError if the mutation rate is not a probability.
+    """
+    mutation = probs["mutation"]
+    if not 0 <= mutation <= 1:
+        raise ValueError(f"mutation probability {mutation} is not in [0, 1]")
+
+    # Each parent passes on one of their two copies at random, which may mutate
+    passing = [
+        (g * (1 - mutation) + (2 - g) * mutation) / 2 for g in range(3)
+    ]
+    child = [
+        [
+            [
+                (1 - passing[m]) * (1 - passing[f]),
+                passing[m] * (1 - passing[f]) + (1 - passing[m]) * passing[f],
+                passing[m] * passing[f]
+            ]
+            for f in range(3)
+        ]
+        for m in range(3)
+    ]
+    tables = {
+        "gene": [probs["gene"][g] for g in range(3)],
+        "child": child,
+        "trait": [
+            [probs["trait"][g][False], probs["trait"][g][True]]
+            for g in range(3)
+        ]
+    }
+
+    # The same tables of natural logarithms, for adding up log-probabilities
+    for name in list(tables):
+        tables[f"log_{name}"] = log_table(tables[name])
+    return tables
+
+
+def log_table(table):
+    """
+    Return a table of the same shape as `table`, a nested list of
+    probabilities, holding their natural logarithms.
+    """
+    if isinstance(table, list):
+        return [log_table(entry) for entry in table]
+    return math.log(table) if table > 0 else -math.inf
+
+
+def empty_probabilities(people, log=False):
+    """
+    Return a dictionary of gene and trait probabilities, all zero,
+    for every person in `people`, or their logarithms if `log` is true.
+    """
+    zero = -math.inf if log else 0
+    return {
         person: {
             "gene": {
-                2: 0,
-                1: 0,
-                0: 0
+                2: zero,
+                1: zero,
+                0: zero
             },
             "trait": {
-                True: 0,
-                False: 0
+                True: zero,
+                False: zero
             }
         }
         for person in people
     }
 
+
+def enumerate_probabilities(people, log=False, tables=None):
+    """
+    Return unnormalized gene and trait probabilities for every person,
+    summing the joint probability of every assignment of genes and traits
+    that agrees with the known traits, or their logarithms if `log` is true.
+    Probabilities come from `tables`, as returned by compile_tables,
+    or from TABLES if not given.
+    """
+    probabilities = empty_probabilities(people)
+    shift = -math.inf
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
@@ -78,58 +273,607 @@ def main():
             for two_genes in powerset(names - one_gene):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                print(f'this is the joint porbability: {joint_probability(people, one_gene, two_genes, have_trait)}')
+                p = joint_probability(
+                    people, one_gene, two_genes, have_trait, log, tables
+                )
+                if log:
+                    shift = update_log(
+                        probabilities, one_gene, two_genes, have_trait, p, shift
+                    )
+                else:
+                    update(probabilities, one_gene, two_genes, have_trait, p)
+
+    if log:
+        log_probabilities(probabilities, shift)
+    return probabilities
+
+
+def parallel_probabilities(people, processes=None, log=False, tables=None):
+    """
+    Return the same probabilities as enumerate_probabilities, splitting
+    the enumeration into shards that a pool of worker processes sum up
+    separately, and adding together the probabilities of every shard.
+
+    Every pair of a set of people who have the trait, agreeing with the
+    known traits, and a set of people who have one gene is numbered, and
+    each shard is a range of those numbers. If `log` is true, shards
+    add up log-probabilities, and their logarithms are returned.
+    Shards carry `tables` with them, as workers may not share this
+    process's memory.
+    """
+    tables = tables or TABLES
+    names = list(people)
+    unknown = [name for name in names if people[name]["trait"] is None]
+    pairs = 2 ** len(unknown) * 2 ** len(names)
+    processes = processes or os.cpu_count() or 1
+    size = -(-pairs // (processes * SHARDS_PER_PROCESS))
+    shards = [
+        (people, start, min(start + size, pairs), log, tables)
+        for start in range(0, pairs, size)
+    ]
+
+    probabilities = empty_probabilities(people, log)
+    with multiprocessing.Pool(processes) as pool:
+        for shard in pool.imap_unordered(enumerate_shard, shards):
+            for person in probabilities:
+                for field, distribution in probabilities[person].items():
+                    for value, p in shard[person][field].items():
+                        if log:
+                            distribution[value] = log_add(distribution[value], p)
+                        else:
+                            distribution[value] += p
+    return probabilities
+
+
+def enumerate_shard(shard):
+    """
+    Return unnormalized gene and trait probabilities for every person,
+    summing the joint probability of every assignment in a shard of
+    (people, start, stop, log, tables), as numbered by
+    parallel_probabilities.
+    """
+    people, start, stop, log, tables = shard
+    names = list(people)
+    unknown = [name for name in names if people[name]["trait"] is None]
+    known = {name for name in names if people[name]["trait"]}
+    probabilities = empty_probabilities(people)
+    shift = -math.inf
+
+    for number in range(start, stop):
+        traits, genes = divmod(number, 2 ** len(names))
+        have_trait = known | {
+            name for i, name in enumerate(unknown) if traits >> i & 1
+        }
+        one_gene = {name for i, name in enumerate(names) if genes >> i & 1}
+
+        for two_genes in powerset(set(names) - one_gene):
+            p = joint_probability(
+                people, one_gene, two_genes, have_trait, log, tables
+            )
+            if log:
+                shift = update_log(
+                    probabilities, one_gene, two_genes, have_trait, p, shift
+                )
+            else:
                 update(probabilities, one_gene, two_genes, have_trait, p)
 
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
+    if log:
+        log_probabilities(probabilities, shift)
+    return probabilities
 
-    # Print results
+
+def vectorized_probabilities(people, tables=None):
+    """
+    Return the same probabilities as enumerate_probabilities, computing
+    joint probabilities for many assignments at once with NumPy.
+
+    Gene assignments are rows of a (3^n, n) array of gene counts, and
+    trait assignments agreeing with the known traits are rows of a
+    (2^m, n) array of 0s and 1s, for n people of whom m have unknown traits.
+    Joint probabilities form a matrix with one row per gene assignment
+    and one column per trait assignment, built in blocks of rows to
+    bound memory, and each person's probabilities are its sums over
+    the rows or columns where they have each gene count or trait.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    gene, child, trait = probability_arrays(tables)
+
+    # Trait assignments that agree with the known traits
+    unknown = [i for i, name in enumerate(names) if people[name]["trait"] is None]
+    traits = np.zeros((2 ** len(unknown), len(names)), dtype=np.intp)
+    for i, name in enumerate(names):
+        if people[name]["trait"]:
+            traits[:, i] = 1
+    for bit, i in enumerate(unknown):
+        traits[:, i] = (np.arange(len(traits)) >> bit) & 1
+
+    gene_totals = np.zeros((len(names), 3))
+    trait_totals = np.zeros((len(names), 2))
+    rows = max(1, BLOCK // len(traits))
+    powers = 3 ** np.arange(len(names), dtype=np.intp)
+    for start in range(0, 3 ** len(names), rows):
+
+        # Gene counts are the base-3 digits of each assignment's number
+        numbers = np.arange(start, min(start + rows, 3 ** len(names)))
+        genes = numbers[:, None] // powers % 3
+
+        # Multiply in each person's gene and trait probability
+        joint = np.ones((len(genes), len(traits)))
+        for i, name in enumerate(names):
+            mother, father = people[name]["mother"], people[name]["father"]
+            if father is None:
+                p = gene[genes[:, i]]
+            else:
+                p = child[
+                    genes[:, index[mother]], genes[:, index[father]], genes[:, i]
+                ]
+            joint *= p[:, None] * trait[genes[:, i][:, None], traits[:, i]]
+
+        by_genes = joint.sum(axis=1)
+        by_traits = joint.sum(axis=0)
+        for i in range(len(names)):
+            gene_totals[i] += np.bincount(genes[:, i], by_genes, minlength=3)
+            trait_totals[i] += np.bincount(traits[:, i], by_traits, minlength=2)
+
+    probabilities = empty_probabilities(people)
+    for i, name in enumerate(names):
+        for g in range(3):
+            probabilities[name]["gene"][g] = float(gene_totals[i, g])
+        probabilities[name]["trait"][True] = float(trait_totals[i, 1])
+        probabilities[name]["trait"][False] = float(trait_totals[i, 0])
+    return probabilities
+
+
+def pruned_probabilities(people, tables=None):
+    """
+    Return the same probabilities as enumerate_probabilities, assigning
+    a gene count and trait to one person at a time, parents before their
+    children, and skipping assignments that disagree with known traits
+    or have zero probability as soon as they arise.
+
+    Each person's probability given the people before them is multiplied
+    into a running product, and each partial assignment adds its product
+    times the sum over all of its completions to the totals of the person
+    it last assigned, so every assignment costs a constant amount of work.
+    """
+    tables = tables or TABLES
+    gene, child, trait = tables["gene"], tables["child"], tables["trait"]
+    order = topological_order(people)
+    probabilities = empty_probabilities(people)
+    genes = {}
+
+    def expand(depth, prefix):
+        """
+        Return the sum of the probabilities of every assignment of the
+        people from `depth` on, given the genes of the people before them,
+        whose probability is `prefix`.
+        """
+        if depth == len(order):
+            return 1
+        person = order[depth]
+        mother, father = people[person]["mother"], people[person]["father"]
+        if father is None:
+            chances = gene
+        else:
+            chances = child[genes[mother]][genes[father]]
+        known = people[person]["trait"]
+        traits = [True, False] if known is None else [known]
+
+        total = 0
+        for g in range(3):
+            genes[person] = g
+            for t in traits:
+                p = chances[g] * trait[g][t]
+                if p == 0:
+                    continue
+                rest = expand(depth + 1, prefix * p)
+                probabilities[person]["gene"][g] += prefix * p * rest
+                probabilities[person]["trait"][t] += prefix * p * rest
+                total += p * rest
+        return total
+
+    expand(0, 1)
+    return probabilities
+
+
+def weighting_probabilities(people, samples=SAMPLES, seed=None, errors=None,
+                            tables=None, diagnostics=None):
+    """
+    Return estimates of every person's gene and trait probabilities by
+    likelihood weighting: `samples` gene assignments are drawn at once,
+    parents before children, and each is weighted by the probability
+    of the known traits given its genes.
+
+    Unknown traits are not drawn, but estimated from the probability of
+    the trait given each drawn gene count. If `errors` is given, it is
+    filled with the standard error of every estimate. With many known
+    traits, a few samples carry almost all of the weight, so prefer
+    gibbs_probabilities for large families with much evidence.
+
+    How many samples the weights are worth is the effective sample size
+    (sum of weights)^2 / (sum of squared weights), stored in `diagnostics`
+    as "effective_samples" if given. The usual standard error vanishes
+    for values drawn rarely or never, so no sampled estimate's error is
+    taken to be smaller than that of a proportion over the effective
+    samples, after adding one sample with and one without the value.
+    """
+    if samples < 1:
+        raise ValueError("there must be at least one sample")
+    rng = np.random.default_rng(seed)
+    gene, child, trait = probability_arrays(tables)
+    order = topological_order(people)
+    index = {person: i for i, person in enumerate(order)}
+
+    # Weights are kept as logarithms, as they may be too small for a float
+    genes = np.zeros((samples, len(order)), dtype=np.intp)
+    weights = np.zeros(samples)
+    for i, person in enumerate(order):
+        mother, father = people[person]["mother"], people[person]["father"]
+        if father is None:
+            chances = np.broadcast_to(gene, (samples, 3))
+        else:
+            chances = child[genes[:, index[mother]], genes[:, index[father]]]
+        genes[:, i] = sample_genes(rng, chances)
+        if people[person]["trait"] is not None:
+            with np.errstate(divide="ignore"):
+                weights += np.log(
+                    trait[genes[:, i], int(people[person]["trait"])]
+                )
+    weights = np.exp(weights - weights.max())
+
+    total = weights.sum()
+    effective = total ** 2 / (weights @ weights)
+    if diagnostics is not None:
+        diagnostics["effective_samples"] = float(effective)
+
+    probabilities = empty_probabilities(people)
+    for person, i in index.items():
+        for field, value, x in sample_values(people[person], genes[:, i], trait):
+            estimate = weights @ x / total
+            probabilities[person][field][value] = float(estimate)
+            if errors is None:
+                continue
+            error = np.sqrt(weights ** 2 @ (x - estimate) ** 2) / total
+
+            # Known traits are not sampled, so only they are certain
+            if field == "gene" or people[person]["trait"] is None:
+                smoothed = (estimate * effective + 1) / (effective + 2)
+                error = max(error, np.sqrt(smoothed * (1 - smoothed) / effective))
+            errors[person][field][value] = float(error)
+    return probabilities
+
+
+def gibbs_probabilities(people, samples=SAMPLES, seed=None, errors=None,
+                        tables=None, diagnostics=None):
+    """
+    Return estimates of every person's gene and trait probabilities by
+    Gibbs sampling: CHAINS chains start from genes drawn without regard
+    to the known traits, and every sweep redraws each person's gene count
+    given their parents', children's and children's other parents' gene
+    counts and their own known trait, for all chains at once.
+
+    After BURN_IN sweeps, sweeps are averaged until `samples` samples
+    have been seen across all chains, of which there are fewer than
+    CHAINS if `samples` is smaller, but at least two, so that their
+    spread can be measured. If `errors` is given, it is filled
+    with the standard error of every estimate, from the spread of the
+    chains' averages. If `diagnostics` is given, the number of samples
+    averaged is stored in it as "samples".
+    """
+    if samples < 2:
+        raise ValueError("Gibbs sampling needs at least two samples")
+    rng = np.random.default_rng(seed)
+    gene, child, trait = probability_arrays(tables)
+    order = topological_order(people)
+    index = {person: i for i, person in enumerate(order)}
+    chains = min(CHAINS, samples)
+    sweeps = samples // chains
+    if diagnostics is not None:
+        diagnostics["samples"] = chains * sweeps
+
+    # Keep track of each person's children, along with their other parent
+    children = {person: [] for person in order}
+    for person in order:
+        mother, father = people[person]["mother"], people[person]["father"]
+        if father is not None:
+            children[mother].append((index[person], index[father], "mother"))
+            children[father].append((index[person], index[mother], "father"))
+
+    genes = np.zeros((chains, len(order)), dtype=np.intp)
+    for i, person in enumerate(order):
+        mother, father = people[person]["mother"], people[person]["father"]
+        if father is None:
+            chances = np.broadcast_to(gene, (chains, 3))
+        else:
+            chances = child[genes[:, index[mother]], genes[:, index[father]]]
+        genes[:, i] = sample_genes(rng, chances)
+
+    # Keep track of each chain's totals of gene counts and trait chances
+    gene_totals = np.zeros((chains, len(order), 3))
+    trait_totals = np.zeros((chains, len(order)))
+    for sweep in range(BURN_IN + sweeps):
+        for i, person in enumerate(order):
+            mother, father = people[person]["mother"], people[person]["father"]
+            if father is None:
+                chances = np.tile(gene, (chains, 1))
+            else:
+                chances = child[genes[:, index[mother]], genes[:, index[father]]]
+            if people[person]["trait"] is not None:
+                chances = chances * trait[:, int(people[person]["trait"])]
+            for c, other, role in children[person]:
+                if role == "mother":
+                    chances = chances * child[:, genes[:, other], genes[:, c]].T
+                else:
+                    chances = chances * child[genes[:, other], :, genes[:, c]]
+            genes[:, i] = sample_genes(rng, chances)
+
+        if sweep >= BURN_IN:
+            gene_totals += genes[:, :, None] == np.arange(3)
+            trait_totals += trait[genes, 1]
+
+    probabilities = empty_probabilities(people)
+    for person, i in index.items():
+        means = {("gene", g): gene_totals[:, i, g] / sweeps for g in range(3)}
+        if people[person]["trait"] is None:
+            has_trait = trait_totals[:, i] / sweeps
+        else:
+            has_trait = np.full(chains, float(people[person]["trait"]))
+        means[("trait", True)] = has_trait
+        means[("trait", False)] = 1 - has_trait
+        for (field, value), x in means.items():
+            probabilities[person][field][value] = float(x.mean())
+            if errors is not None:
+                errors[person][field][value] = float(
+                    x.std(ddof=1) / np.sqrt(chains)
+                )
+    return probabilities
+
+
+def probability_arrays(tables=None):
+    """
+    Return the "gene", "child" and "trait" tables in `tables`,
+    or TABLES if not given, as arrays.
+    """
+    tables = tables or TABLES
+    return (
+        np.array(tables["gene"]),
+        np.array(tables["child"]),
+        np.array(tables["trait"])
+    )
+
+
+def sample_genes(rng, chances):
+    """
+    Return a gene count drawn for each row of `chances`, an array of
+    relative probabilities of 0, 1 and 2 copies of the gene.
+    """
+    cumulative = chances.cumsum(axis=1)
+    u = rng.random(len(cumulative)) * cumulative[:, -1]
+    return np.minimum((u[:, None] >= cumulative).sum(axis=1), 2)
+
+
+def sample_values(person, genes, trait):
+    """
+    Generate a (field, value, x) triple for each of a person's probabilities,
+    where x holds, for each sample of the person's `genes`, the chance
+    that the person has that gene count or trait value, given the array
+    `trait` of probabilities of the trait by gene count.
+    """
+    for g in range(3):
+        yield "gene", g, (genes == g).astype(float)
+    if person["trait"] is None:
+        has_trait = trait[genes, 1]
+    else:
+        has_trait = np.full(len(genes), float(person["trait"]))
+    yield "trait", True, has_trait
+    yield "trait", False, 1 - has_trait
+
+
+def topological_order(people):
+    """
+    Return a list of everyone in `people`, with parents before children.
+    """
+    order = []
+    placed = set()
     for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+        stack = [person]
+        while stack:
+            current = stack[-1]
+            if current in placed:
+                stack.pop()
+                continue
+            parents = [
+                parent for parent in (
+                    people[current]["mother"], people[current]["father"]
+                )
+                if parent is not None and parent not in placed
+            ]
+            if parents:
+                stack.extend(parents)
+            else:
+                placed.add(current)
+                order.append(current)
+                stack.pop()
+    return order
 
 
-def load_data(filename):
+def eliminate_probabilities(people, tables=None):
     """
-    Load gene and trait data from a file into a dictionary.
-    File assumed to be a CSV containing fields name, mother, father, trait.
-    mother, father must both be blank, or both be valid names in the CSV.
-    trait should be 0 or 1 if trait is known, blank otherwise.
+    Return gene and trait probabilities for every person by variable
+    elimination: the joint probability is a product of one factor per
+    person, over their gene count and those of their parents, and each
+    person's gene probabilities come from summing out everyone else's
+    gene count, one person at a time.
+
+    Known traits only scale each person's factor, and unknown traits sum
+    to 1, so they never need to be summed out. For pedigrees shaped like
+    trees, every intermediate factor is over at most a few people, and
+    the time grows polynomially with the size of the family.
     """
-    data = dict()
-    with open(filename) as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            name = row["name"]
-            data[name] = {
-                "name": name,
-                "mother": row["mother"] or None,
-                "father": row["father"] or None,
-                "trait": (True if row["trait"] == "1" else
-                          False if row["trait"] == "0" else None)
-            }
-    return data
+    tables = tables or TABLES
+    factors = pedigree_factors(people, tables)
+    order = elimination_order(people)
+
+    probabilities = empty_probabilities(people)
+    for person in people:
+        genes = marginal(factors, [p for p in order if p != person], person)
+        for g in range(3):
+            probabilities[person]["gene"][g] = genes[g]
+
+        # Trait probabilities follow from gene probabilities
+        trait = people[person]["trait"]
+        if trait is None:
+            p = sum(genes[g] * tables["trait"][g][True] for g in range(3))
+            probabilities[person]["trait"][True] = p
+            probabilities[person]["trait"][False] = sum(genes) - p
+        else:
+            probabilities[person]["trait"][trait] = sum(genes)
+    return probabilities
+
+
+def pedigree_factors(people, tables):
+    """
+    Return one factor per person, as a pair of the people it is over and a
+    dictionary mapping their gene counts to the probability of the person's
+    gene count given their parents' and of the person's trait, if known,
+    as given by `tables`.
+    """
+    gene, child = tables["gene"], tables["child"]
+
+    factors = []
+    for person in people:
+        trait = people[person]["trait"]
+        evidence = [
+            1 if trait is None else tables["trait"][g][trait] for g in range(3)
+        ]
+        mother, father = people[person]["mother"], people[person]["father"]
+        if father is None:
+            factors.append(((person,), {
+                (g,): gene[g] * evidence[g] for g in range(3)
+            }))
+            continue
+
+        table = {}
+        for m, f, g in itertools.product(range(3), repeat=3):
+            table[(g, m, f)] = child[m][f][g] * evidence[g]
+        factors.append(((person, mother, father), table))
+    return factors
+
+
+def elimination_order(people):
+    """
+    Return an order in which to sum out everyone's gene count, greedily
+    choosing the person with the fewest neighbors in the moral graph,
+    where each person is linked to their parents, and parents to each other.
+    """
+    neighbors = {person: set() for person in people}
+    for person in people:
+        mother, father = people[person]["mother"], people[person]["father"]
+        if father is not None:
+            for a, b in itertools.permutations((person, mother, father), 2):
+                neighbors[a].add(b)
+
+    order = []
+    while neighbors:
+        person = min(neighbors, key=lambda p: len(neighbors[p]))
+        order.append(person)
+
+        # Summing out a person links all of their neighbors together
+        for a, b in itertools.permutations(neighbors[person], 2):
+            neighbors[a].add(b)
+        for other in neighbors.pop(person):
+            neighbors[other].discard(person)
+    return order
+
+
+def marginal(factors, order, query):
+    """
+    Return values proportional to the sum of the product of `factors`
+    for each gene count of `query`, summing out everyone else in `order`.
+    """
+    # Keep track of which factors each person appears in
+    numbering = itertools.count()
+    factors = {next(numbering): factor for factor in factors}
+    appears = {}
+    for n, (variables, _) in factors.items():
+        for variable in variables:
+            appears.setdefault(variable, set()).add(n)
+
+    for variable in order:
+        numbers = appears.pop(variable, set())
+        variables, table = sum_out([factors.pop(n) for n in numbers], variable)
+        n = next(numbering)
+        factors[n] = (variables, table)
+        for other in variables:
+            appears[other] -= numbers
+            appears[other].add(n)
+
+    genes = [1, 1, 1]
+    for variables, table in factors.values():
+        for g in range(3):
+            genes[g] *= table[(g,) * len(variables)]
+    return genes
+
+
+def sum_out(factors, variable):
+    """
+    Return the factor over everyone in `factors` except `variable`,
+    multiplying the factors together and summing over `variable`.
+    """
+    variables = tuple(dict.fromkeys(
+        v for vs, _ in factors for v in vs if v != variable
+    ))
+    full = variables + (variable,)
+    positions = [
+        (table, [full.index(v) for v in vs]) for vs, table in factors
+    ]
+
+    result = {}
+    for values in itertools.product(range(3), repeat=len(variables)):
+        total = 0
+        for g in range(3):
+            assignment = values + (g,)
+            p = 1
+            for table, indices in positions:
+                p *= table[tuple(assignment[i] for i in indices)]
+            total += p
+        result[values] = total
+
+    # Scale the factor so that its largest entry is 1, so that products of
+    # many factors cannot underflow, as the scale cancels out in normalize
+    largest = max(result.values())
+    if largest > 0:
+        for values in result:
+            result[values] /= largest
+    return variables, result
 
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Generate all possible subsets of set s, one at a time.
+
+    Subsets are generated in Gray code order, where the bits of the n-th
+    subset's code say which items of s it holds and consecutive codes
+    differ by one bit, so every subset is the same set with one item
+    added or removed. Copy a subset to keep it past the next step.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    subset = set()
+    yield subset
+    for n in range(1, 2 ** len(s)):
+
+        # The item to flip is the lowest set bit of n
+        item = s[(n & -n).bit_length() - 1]
+        if item in subset:
+            subset.remove(item)
+        else:
+            subset.add(item)
+        yield subset
 
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def joint_probability(people, one_gene, two_genes, have_trait, log=False,
+                      tables=None):
     """
     Compute and return a joint probability.
 
@@ -139,76 +883,44 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
+
+    If `log` is true, return its natural logarithm instead, as a sum
+    of logarithms, which cannot underflow however many people there are.
+    Probabilities come from `tables`, or from TABLES if not given.
     """
-    if one_gene == {"Harry"} and two_genes == {"James"} and have_trait == {"James"}:
-        
-    probabilities2=  []
- 
-    for person in people:
-        if people[person]['father'] == None:
-            if person in one_gene: # 0.03
-                
-                if person in have_trait: # 0.56
-                    probabilities2.append(0.03 * 0.56)
-                else:
-                    probabilities2.append(0.03 * 0.44)
-            elif person in two_genes: #0.01
-                if person in have_trait: #0.65
-                    probabilities2.append(0.01*0.65)
-                else: #0.35
-                    probabilities2.append(0.01*0.35)
-            else: #0.96
-                if person in have_trait: 
-                    probabilities2.append(0.96*0.01)
-                else:
-                    probabilities2.append(0.96*0.99)
-        else:
-            current_father = people[person]['father']
-            current_mother = people[person]['mother']
-            probability_of_passing_gene = []
-            if current_father in one_gene:
-                probability_of_passing_gene.append(0.5) #BURAYA TEKRAR BAK SAYILARA
-            elif current_father in two_genes:
-                probability_of_passing_gene.append(0.99)
-            else:
-                probability_of_passing_gene.append(0.01)
-                
-            if current_mother in one_gene:
-                probability_of_passing_gene.append(0.5)
-            elif current_mother in two_genes:
-                probability_of_passing_gene.append(0.99)
-            else:
-                probability_of_passing_gene.append(0.01)
-            #------------------------------------------
-            if person in one_gene:
-                tempprob = ( (1-probability_of_passing_gene[0])*(probability_of_passing_gene[1]) ) + ((probability_of_passing_gene[0])*(1-probability_of_passing_gene[1]) )
-                
-                if person in have_trait:
-                    probabilities2.append(PROBS["trait"][1][True]*tempprob)
-                else:
-                     probabilities2.append(PROBS["trait"][1][False]*tempprob)   
-             
-            elif person in two_genes:
-                tempprob = probability_of_passing_gene[0]*probability_of_passing_gene[1]
-                if person in have_trait:
-                    probabilities2.append(PROBS["trait"][2][True]*tempprob)   
-                else:
-                    probabilities2.append(PROBS["trait"][2][False]*tempprob)   
-                    
+    tables = tables or TABLES
+    if log:
+        gene, child, trait = (
+            tables["log_gene"], tables["log_child"], tables["log_trait"]
+        )
+    else:
+        gene, child, trait = tables["gene"], tables["child"], tables["trait"]
+
+    genes = {
+        person: 2 if person in two_genes else 1 if person in one_gene else 0
+        for person in people
+    }
+
+    if log:
+        probability = 0
+        for person, g in genes.items():
+            father = people[person]["father"]
+            if father is None:
+                probability += gene[g]
             else:
-                tempprob = (1-probability_of_passing_gene[0])*(1-probability_of_passing_gene[1])
-                if person in have_trait:
-                    probabilities2.append(PROBS["trait"][0][True]*tempprob)   
-                
-                else:
-                    probabilities2.append(PROBS["trait"][0][False]*tempprob)   
-            probability_of_passing_gene = []          
-    product = 1
-    
-    for p in probabilities2:
-       
-        product *= p
-    return product
+                probability += child[genes[people[person]["mother"]]][genes[father]][g]
+            probability += trait[g][person in have_trait]
+        return probability
+
+    probability = 1
+    for person, g in genes.items():
+        father = people[person]["father"]
+        if father is None:
+            probability *= gene[g]
+        else:
+            probability *= child[genes[people[person]["mother"]]][genes[father]][g]
+        probability *= trait[g][person in have_trait]
+    return probability
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -218,7 +930,6 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
     Which value for each distribution is updated depends on whether
     the person is in `have_gene` and `have_trait`, respectively.
     """
-    print(f'p is: {p}')
     for person in probabilities:
         if person in one_gene:
             probabilities[person]["gene"][1] += p
@@ -240,36 +951,104 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
                 probabilities[person]["trait"][False] += p 
 
 
-def normalize(probabilities):
+def update_log(probabilities, one_gene, two_genes, have_trait, p, shift):
+    """
+    Add to `probabilities` a new joint probability whose natural logarithm
+    is `p`, where `probabilities` are held as multiples of exp(`shift`),
+    and return the new shift.
+
+    The shift is the largest logarithm added so far, and probabilities
+    are rescaled whenever it grows, so that however small the joint
+    probabilities get, the largest ones are kept as ordinary floats.
+    """
+    if p == -math.inf:
+        return shift
+    if p > shift:
+        scale = math.exp(shift - p)
+        for person in probabilities:
+            for distribution in probabilities[person].values():
+                for value in distribution:
+                    distribution[value] *= scale
+        shift = p
+    update(probabilities, one_gene, two_genes, have_trait, math.exp(p - shift))
+    return shift
+
+
+def log_probabilities(probabilities, shift):
+    """
+    Replace `probabilities`, held as multiples of exp(`shift`),
+    by their natural logarithms.
+    """
+    for person in probabilities:
+        for distribution in probabilities[person].values():
+            for value, p in distribution.items():
+                distribution[value] = math.log(p) + shift if p > 0 else -math.inf
+
+
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving logarithms, so that
+    probabilities too small for a float can still be added.
+    """
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
+def normalize(probabilities, log=False):
     """
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
+
+    If `log` is true, `probabilities` hold natural logarithms, which are
+    replaced by the normalized probabilities themselves.
     """
     for person in probabilities:
-        trait_val1 = probabilities[person]["trait"][True]
-        trait_val2 = probabilities[person]["trait"][False]
-        
-        sum = trait_val1  + trait_val2        
-        
-        normalized_trait_val1 = trait_val1/sum
-        normalized_trait_val2 = trait_val2/sum
-        
-        probabilities[person]["trait"][True] = normalized_trait_val1
-        probabilities[person]["trait"][False] = normalized_trait_val2
-        
-        zero_val = probabilities[person]["gene"][0]
-        one_val = probabilities[person]["gene"][1]
-        two_val = probabilities[person]["gene"][2]
-        sum2 = zero_val + one_val + two_val 
-        
-        normalized_zero_val = zero_val / sum2
-        normalized_one_val = one_val / sum2
-        normalized_two_val = two_val / sum2
-        
-        probabilities[person]["gene"][0] = normalized_zero_val 
-        probabilities[person]["gene"][1] = normalized_one_val
-        probabilities[person]["gene"][2] = normalized_two_val
-        
+        for distribution in probabilities[person].values():
+            if log:
+
+                # Shift by the largest logarithm so that exp cannot underflow
+                largest = max(distribution.values())
+                for value in distribution:
+                    distribution[value] = math.exp(distribution[value] - largest)
+            total = sum(distribution.values())
+            for value in distribution:
+                distribution[value] /= total
+
+
+# Lookup tables of the inheritance model in PROBS, used by every engine
+# unless given other tables
+TABLES = compile_tables(PROBS)
+
+# Ways of computing probabilities, each a function of the people and
+# optionally of the tables to use, returning their unnormalized gene and
+# trait probabilities
+ENGINES = {
+    "enumerate": enumerate_probabilities,
+    "parallel": parallel_probabilities,
+    "vectorized": vectorized_probabilities,
+    "pruned": pruned_probabilities,
+    "eliminate": eliminate_probabilities,
+    "weighting": weighting_probabilities,
+    "gibbs": gibbs_probabilities
+}
+
+# Command-line options passed on to each engine that takes any
+ENGINE_OPTIONS = {
+    "enumerate": ["log"],
+    "parallel": ["processes", "log"],
+    "weighting": ["samples", "seed"],
+    "gibbs": ["samples", "seed"]
+}
+
+# Engines that need NumPy
+NUMPY_ENGINES = {"vectorized", "weighting", "gibbs"}
+
+# Engines that estimate probabilities, along with their standard errors
+SAMPLING_ENGINES = {"weighting", "gibbs"}
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def forced_cells(cells, sentences):
+    """
+    Treats each sentence about `cells` as a linear equation over 0/1
+    variables, one per cell, and returns the sets of cells that must be
+    safe and that must be mines in every solution that can be found by
+    elimination and bound reasoning.
+
+    The equations are reduced by fraction-free Gaussian elimination over
+    the integers, so that coefficients stay exact. Then, in every row,
+    if the count equals the smallest possible sum of its terms, cells with
+    positive coefficients are safe and those with negative ones are mines,
+    and if it equals the largest possible sum, the reverse holds.
+    """
+    position = {cell: n for n, cell in enumerate(cells)}
+    matrix = np.zeros((len(sentences), len(cells) + 1), dtype=np.int64)
+    for row, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            matrix[row, position[cell]] = 1
+        matrix[row, -1] = sentence.count
+
+    # Eliminate each column from every row but its pivot row
+    pivot = 0
+    for column in range(len(cells)):
+        if pivot == len(sentences):
+            break
+        candidates = np.flatnonzero(matrix[pivot:, column]) + pivot
+        if len(candidates) == 0:
+            continue
+        matrix[[pivot, candidates[0]]] = matrix[[candidates[0], pivot]]
+        others = matrix[:, column] != 0
+        others[pivot] = False
+        if others.any():
+            rows = (matrix[others] * matrix[pivot, column]
+                    - np.outer(matrix[others, column], matrix[pivot]))
+
+            # Divide each row by its common factor to keep entries small
+            divisors = np.gcd.reduce(rows, axis=1)
+            divisors[divisors == 0] = 1
+            matrix[others] = rows // divisors[:, None]
+        pivot += 1
+
+    coefficients = matrix[:, :-1]
+    counts = matrix[:, -1]
+    positive = coefficients > 0
+    negative = coefficients < 0
+    lowest = np.where(negative, coefficients, 0).sum(axis=1) == counts
+    highest = np.where(positive, coefficients, 0).sum(axis=1) == counts
+
+    safe = ((positive & lowest[:, None]) | (negative & highest[:, None])).any(axis=0)
+    mine = ((negative & lowest[:, None]) | (positive & highest[:, None])).any(axis=0)
+    return (
+        {cells[n] for n in np.flatnonzero(safe)},
+        {cells[n] for n in np.flatnonzero(mine)}
+    )
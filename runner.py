@@ -1,6 +1,7 @@
 import pygame
+import queue
 import sys
-import time
+import threading
 
 from minesweeper import Minesweeper, MinesweeperAI
 
@@ -8,6 +9,12 @@ HEIGHT = 8
 WIDTH = 8
 MINES = 8
 
+# Smallest size of a cell in pixels; boards that do not fit will scroll
+MIN_CELL_SIZE = 20
+
+# Most frames drawn per second
+FPS = 60
+
 # Colors
 BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
@@ -17,6 +24,7 @@ WHITE = (255, 255, 255)
 pygame.init()
 size = width, height = 600, 400
 screen = pygame.display.set_mode(size)
+clock = pygame.time.Clock()
 
 # Fonts
 OPEN_SANS = "assets/fonts/OpenSans-Regular.ttf"
@@ -28,18 +36,123 @@ largeFont = pygame.font.Font(OPEN_SANS, 40)
 BOARD_PADDING = 20
 board_width = ((2 / 3) * width) - (BOARD_PADDING * 2)
 board_height = height - (BOARD_PADDING * 2)
-cell_size = int(min(board_width / WIDTH, board_height / HEIGHT))
+cell_size = max(
+    MIN_CELL_SIZE, int(min(board_width / WIDTH, board_height / HEIGHT))
+)
 board_origin = (BOARD_PADDING, BOARD_PADDING)
 
+# Compute how many rows and columns are visible at once
+view_rows = min(HEIGHT, int(board_height // cell_size))
+view_cols = min(WIDTH, int(board_width // cell_size))
+
 # Add images
 flag = pygame.image.load("assets/images/flag.png")
 flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
+# Render each number of nearby mines once
+cellFont = pygame.font.Font(OPEN_SANS, min(20, cell_size - 4))
+numbers = [cellFont.render(str(n), True, BLACK) for n in range(9)]
+
+# Panel buttons and their labels
+aiButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+aiText = mediumFont.render("AI Move", True, BLACK)
+resetButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+resetText = mediumFont.render("Reset", True, BLACK)
+autoplayButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 90,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+autoplayTexts = {
+    False: mediumFont.render("Autoplay", True, BLACK),
+    True: mediumFont.render("Stop", True, BLACK)
+}
+statusRect = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (5 / 6) * height - 25,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+statusTexts = {
+    text: mediumFont.render(text, True, WHITE)
+    for text in ("", "Lost", "Won")
+}
+
+
+
+class AIWorker():
+    """
+    Runs a MinesweeperAI on a background thread, so that the window
+    stays responsive while the AI learns and chooses its moves
+    """
+
+    def __init__(self, ai):
+        self.ai = ai
+
+        # Requests from the window, and moves chosen in answer to them
+        self.requests = queue.Queue()
+        self.moves = queue.Queue()
+
+        self.cancelled = threading.Event()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            request, revealed = self.requests.get()
+            if self.cancelled.is_set():
+                return
+            if request == "learn":
+                self.ai.add_knowledge_batch(revealed)
+            elif request == "move":
+                move = self.ai.make_safe_move()
+                safe = move is not None
+                if move is None:
+                    move = self.ai.make_random_move()
+                self.moves.put((move, safe, self.ai.mines.copy()))
+
+    def learn(self, revealed):
+        """
+        Asks the AI to learn from newly revealed cells.
+        """
+        self.requests.put(("learn", revealed))
+
+    def request_move(self):
+        """
+        Asks the AI to choose a move, to be collected with `poll`.
+        """
+        self.requests.put(("move", None))
+
+    def poll(self):
+        """
+        Returns the next (move, safe, mines) triple chosen by the AI,
+        or None if the AI is still thinking.
+        """
+        try:
+            return self.moves.get_nowait()
+        except queue.Empty:
+            return None
+
+    def cancel(self):
+        """
+        Stops the worker once it finishes what it is doing,
+        discarding any requests not yet handled.
+        """
+        self.cancelled.set()
+        self.requests.put(("stop", None))
+
+
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+worker = AIWorker(MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES))
+
+# Keep track of whether the AI is choosing a move, and is playing by itself
+thinking = False
+autoplay = False
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
@@ -49,17 +162,76 @@ lost = False
 # Show instructions initially
 instructions = True
 
+# Keep track of the top-left visible cell, cells that changed since they
+# were last drawn, whether everything must be redrawn, and the status shown
+top, left = 0, 0
+dirty = set()
+redraw = True
+shown_status = None
+
+
+def cell_at(position):
+    """
+    Returns the visible cell at a screen position, or None.
+    """
+    x = position[0] - board_origin[0]
+    y = position[1] - board_origin[1]
+    if not (0 <= x < view_cols * cell_size and 0 <= y < view_rows * cell_size):
+        return None
+    return (top + y // cell_size, left + x // cell_size)
+
+
+def draw_cell(cell):
+    """
+    Draws a visible cell, and returns the rectangle it covers.
+    """
+    i, j = cell
+    rect = pygame.Rect(
+        board_origin[0] + (j - left) * cell_size,
+        board_origin[1] + (i - top) * cell_size,
+        cell_size, cell_size
+    )
+    pygame.draw.rect(screen, GRAY, rect)
+    pygame.draw.rect(screen, WHITE, rect, 3)
+
+    # Add a mine, flag, or number if needed
+    if game.is_mine(cell) and lost:
+        screen.blit(mine, rect)
+    elif cell in flags:
+        screen.blit(flag, rect)
+    elif cell in revealed:
+        neighbors = numbers[game.nearby_mines(cell)]
+        neighborsTextRect = neighbors.get_rect()
+        neighborsTextRect.center = rect.center
+        screen.blit(neighbors, neighborsTextRect)
+    return rect
+
+
 while True:
 
-    # Check if game quit
+    # Check if game quit, board scrolled, or mouse clicked
+    clicks = []
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
-
-    screen.fill(BLACK)
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 3):
+            clicks.append((event.button, event.pos))
+        rows = cols = 0
+        if event.type == pygame.MOUSEWHEEL:
+            rows, cols = -3 * event.y, 3 * event.x
+        elif event.type == pygame.KEYDOWN:
+            rows, cols = {
+                pygame.K_UP: (-1, 0), pygame.K_DOWN: (1, 0),
+                pygame.K_LEFT: (0, -1), pygame.K_RIGHT: (0, 1)
+            }.get(event.key, (0, 0))
+        if rows or cols:
+            top = max(0, min(HEIGHT - view_rows, top + rows))
+            left = max(0, min(WIDTH - view_cols, left + cols))
+            redraw = True
 
     # Show game instructions
     if instructions:
+        screen.fill(BLACK)
 
         # Title
         title = largeFont.render("Play Minesweeper", True, WHITE)
@@ -88,139 +260,136 @@ while True:
         screen.blit(buttonText, buttonTextRect)
 
         # Check if play button clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if buttonRect.collidepoint(mouse):
+        for button, mouse in clicks:
+            if button == 1 and buttonRect.collidepoint(mouse):
                 instructions = False
-                time.sleep(0.3)
+                redraw = True
 
         pygame.display.flip()
+        clock.tick(FPS)
         continue
 
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
-
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors = smallFont.render(
-                    str(game.nearby_mines((i, j))),
-                    True, BLACK
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
+    # Draw the whole board and panel only when needed, and otherwise
+    # just the cells that changed
+    if redraw:
+        screen.fill(BLACK)
+        for i in range(top, top + view_rows):
+            for j in range(left, left + view_cols):
+                draw_cell((i, j))
+        for button, text in (
+            (aiButton, aiText), (resetButton, resetText),
+            (autoplayButton, autoplayTexts[autoplay])
+        ):
+            pygame.draw.rect(screen, WHITE, button)
+            textRect = text.get_rect()
+            textRect.center = button.center
+            screen.blit(text, textRect)
+        updates = [screen.get_rect()]
+        shown_status = None
+        redraw = False
+    else:
+        updates = [
+            draw_cell((i, j)) for i, j in dirty
+            if top <= i < top + view_rows and left <= j < left + view_cols
+        ]
+    dirty.clear()
 
     # Display text
-    text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
-    textRect = text.get_rect()
-    textRect.center = ((5 / 6) * width, (2 / 3) * height)
-    screen.blit(text, textRect)
-
-    move = None
-
-    left, _, right = pygame.mouse.get_pressed()
-
-    # Check for a right-click to toggle flagging
-    if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
-                    if (i, j) in flags:
-                        flags.remove((i, j))
-                    else:
-                        flags.add((i, j))
-                    time.sleep(0.2)
-
-    elif left == 1:
-        mouse = pygame.mouse.get_pos()
-
-        # If AI button clicked, make an AI move
-        if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
+    status = "Lost" if lost else "Won" if game.mines == flags else ""
+    if status != shown_status:
+        text = statusTexts[status]
+        textRect = text.get_rect()
+        textRect.center = statusRect.center
+        screen.fill(BLACK, statusRect)
+        screen.blit(text, textRect)
+        updates.append(statusRect)
+        shown_status = status
+
+    moves = []
+
+    for button, mouse in clicks:
+
+        # Check for a right-click to toggle flagging
+        if button == 3:
+            cell = cell_at(mouse)
+            if not lost and cell is not None and cell not in revealed:
+                if cell in flags:
+                    flags.remove(cell)
                 else:
-                    print("No known safe moves, AI making random move.")
-                    print(move)
-            else:
-                print("AI making safe move.")
-                print(move)
-            time.sleep(0.2)
+                    flags.add(cell)
+                dirty.add(cell)
+
+        # If AI button clicked, ask the AI for a move
+        elif aiButton.collidepoint(mouse):
+            if not lost and not thinking:
+                worker.request_move()
+                thinking = True
 
-        # Reset game state
+        # Start or stop the AI playing by itself
+        elif autoplayButton.collidepoint(mouse):
+            autoplay = not autoplay and not lost
+            redraw = True
+
+        # Reset game state, abandoning any move the AI is choosing
         elif resetButton.collidepoint(mouse):
+            worker.cancel()
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            worker = AIWorker(
+                MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
+            )
+            thinking = False
+            autoplay = False
             revealed = set()
             flags = set()
             lost = False
-            continue
+            redraw = True
+            moves = []
 
         # User-made move
         elif not lost:
-            for i in range(HEIGHT):
-                for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
-                            and (i, j) not in flags
-                            and (i, j) not in revealed):
-                        move = (i, j)
-
-    # Make move and update AI knowledge
-    if move:
-        
+            cell = cell_at(mouse)
+            if cell is not None and cell not in flags and cell not in revealed:
+                moves.append(cell)
+
+    # Collect the AI's move once it has been chosen
+    result = worker.poll()
+    if result is not None:
+        thinking = False
+        move, safe, mines = result
+        if move is None:
+            dirty.update(flags ^ mines)
+            flags = mines
+            autoplay = False
+            redraw = True
+            print("No moves left to make.")
+        else:
+            if safe:
+                print("AI making safe move.")
+            else:
+                print("No known safe moves, AI making random move.")
+            print(move)
+            moves.append(move)
+
+    # Make moves and update AI knowledge
+    for move in moves:
+        if lost or move in revealed:
+            continue
         if game.is_mine(move):
             lost = True
+            autoplay = False
+            redraw = True
         else:
-            
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
 
-    pygame.display.flip()
+            # Reveal the move, and any region with no nearby mines around it
+            nearby = game.reveal(move)
+            revealed.update(nearby)
+            dirty.update(nearby)
+            worker.learn(nearby)
+
+    # Keep the AI playing until it runs out of moves or loses
+    if autoplay and not thinking and not lost:
+        worker.request_move()
+        thinking = True
+
+    pygame.display.update(updates)
+    clock.tick(FPS)